@@ -19,6 +19,7 @@
 #include "dds/dds.h"
 
 #include "dds/ddsrt/endian.h"
+#include "dds/ddsrt/log.h"
 #include "dds/ddsrt/md5.h"
 #include "dds/ddsi/q_radmin.h"
 #include "dds/ddsi/ddsi_serdata.h"
@@ -120,15 +121,39 @@ typedef struct ddsi_serdata ddsi_serdata_t;
 typedef struct ddsi_sertype ddsi_sertype_t;
 
 
+// One key member at a fixed offset in the serialized data, copied big-endian into the key.
+typedef struct ddspy_key_field {
+    uint32_t data_offset;
+    uint32_t key_offset;
+    uint32_t size;
+} ddspy_key_field_t;
+
+// Keys longer than this are always computed by python
+#define DDSPY_KEY_LAYOUT_MAX 64
+
 // Python refcount: one ref for each PyObject*.
 typedef struct ddspy_sertype {
     ddsi_sertype_t my_c_type;
     PyObject* my_py_type;
     PyObject* deserialize_attr;
     PyObject* serialize_attr;
+    PyObject* serialize_into_attr;
+    PyObject* serialize_into_keyhash_attr;
+    PyObject* serialized_size_attr;
     PyObject* key_calc_attr;
     PyObject* keyhash_calc_attr;
+    PyObject* keyhash_serialized_attr;
+    bool keyless;
     bool key_maxsize_bigger_16;
+    // Set when the key members are at fixed offsets, the keyhash is then computed in C.
+    ddspy_key_field_t* key_fields;
+    uint32_t key_nfields;
+    uint32_t key_size;
+    uint32_t key_data_size;
+    // Size of the last serialized sample, where serializing the next one starts.
+    uint32_t size_hint;
+    // cdr.typehash(), md5 of the name and structure of the type
+    unsigned char typehash[16];
 } ddspy_sertype_t;
 
 // Python refcount: one ref for sample.
@@ -139,11 +164,19 @@ typedef struct ddspy_serdata {
     size_t data_size;
     ddsi_keyhash_t key;
     bool hash_populated;
+    // Set when deferred serialization at sending time failed, it is not tried again
+    bool serialize_failed;
 } ddspy_serdata_t;
 
-// Python refcount: one ref for sample.
+// Python refcount: one ref for sample, decoder is borrowed.
+// If decoder is set it decodes the serialized data into a sample of its own,
+// instead of the sample cached on the serdata being shared.
+// If deferred is set a written sample is only serialized when the serialized
+// data is needed, which does not happen when all readers are local.
 typedef struct ddspy_sample_container {
     PyObject* sample;
+    PyObject* decoder;
+    bool deferred;
 } ddspy_sample_container_t;
 
 
@@ -172,46 +205,231 @@ ddspy_serdata_t *ddspy_serdata_new(const struct ddsi_sertype* type, enum ddsi_se
     ddspy_serdata_t *new = (ddspy_serdata_t*) malloc(sizeof(ddspy_serdata_t));
     ddsi_serdata_init((ddsi_serdata_t*) new, type, kind);
 
-    new->data = malloc(data_size);
+    new->data = data_size ? malloc(data_size) : NULL;
     new->data_size = data_size;
     new->hash_populated = false;
+    new->serialize_failed = false;
     new->sample = NULL;
 
     return new;
 }
 
 
-void ddspy_serdata_ensure_sample(ddspy_serdata_t* this)
+// Received samples are only deserialized when they are read, samples that are
+// dropped before that never need the GIL. Returns whether there is a sample.
+bool ddspy_serdata_ensure_sample(ddspy_serdata_t* this)
 {
     if (this->sample)
-        return;
+        return true;
 
     PyGILState_STATE state = PyGILState_Ensure();
 
+    // Another reader may have deserialized it while we waited for the GIL
+    if (this->sample) {
+        PyGILState_Release(state);
+        return true;
+    }
+
     /// This is not a copy
     PyObject* memory = PyMemoryView_FromMemory((char*) this->data, this->data_size, PyBUF_READ);
-    PyObject* arglist = Py_BuildValue("(O)", memory);
+    PyObject* result = memory ? PyObject_CallFunctionObjArgs(sertype(this)->deserialize_attr, memory, NULL) : NULL;
+    // We already have a ref to result.
+    Py_XDECREF(memory);
 
-    if (arglist == NULL) {
-        Py_DECREF(memory);
-        return;
+    if (result == NULL) {
+        if (PyErr_Occurred())
+            PyErr_PrintEx(1);
+        PyGILState_Release(state);
+        return false;
     }
 
-    PyObject* result = PyObject_CallObject(sertype(this)->deserialize_attr, arglist);
-    // We already have a ref to result.
+    this->sample = result;
 
-    Py_DECREF(arglist);
-    Py_DECREF(memory);
+    PyGILState_Release(state);
+    return true;
+}
 
-    if (PyErr_Occurred()) {
-        PyErr_PrintEx(1);
-        Py_XDECREF(result);
-        return;
+
+bool ddspy_serdata_set_keyhash(ddspy_serdata_t* this, PyObject* keyhash)
+{
+    /// Caller holds the GIL. This is not a copy
+    const char* buf = PyBytes_AsString(keyhash);
+    Py_ssize_t size = PyBytes_Size(keyhash);
+
+    if (buf == NULL || size != 16) {
+        // Error condition: Python did not give us 16 bytes exactly
+        if (PyErr_Occurred())
+            PyErr_PrintEx(1);
+        return false;
     }
 
-    this->sample = result;
+    memcpy(this->key.value, buf, 16);
+    memcpy(&(this->c_data.hash), buf, 4);
+    this->hash_populated = true;
+    return true;
+}
+
+
+// Serializes sample straight into memory of the serdata with cdr.serialize_into. The memory starts
+// at the size of the previous sample of the type and is reallocated if python says it needs more.
+// With keyhash set, keyed types without a key layout also get their keyhash from the same call.
+// Caller holds the GIL. Sets data and data_size, returns false if serialization failed.
+bool ddspy_serdata_serialize(ddspy_serdata_t* this, PyObject* sample, bool keyhash)
+{
+    ddspy_sertype_t* type = sertype(this);
+    PyObject* serialize = type->serialize_into_attr;
+    if (keyhash && type->serialize_into_keyhash_attr != NULL)
+        serialize = type->serialize_into_keyhash_attr;
+    size_t size = type->size_hint;
+    char* data = (char*) malloc(size);
+    if (data == NULL)
+        return false;
+
+    // The second attempt has the size python asked for, it only fails if the sample changed in between
+    for (int attempt = 0; attempt < 2; attempt++) {
+        /// This is not a copy, python does not keep the memoryview.
+        PyObject* memory = PyMemoryView_FromMemory(data, (Py_ssize_t) size, PyBUF_WRITE);
+        PyObject* result = memory ? PyObject_CallFunctionObjArgs(serialize, sample, memory, NULL) : NULL;
+        Py_XDECREF(memory);
+
+        /// serialize_into_with_keyhash returns (size, keyhash), both are borrowed from result
+        PyObject* pysize = result;
+        PyObject* pykeyhash = Py_None;
+        if (result != NULL && serialize != type->serialize_into_attr && !PyArg_ParseTuple(result, "OO", &pysize, &pykeyhash))
+            pysize = NULL;
+
+        Py_ssize_t needed = pysize ? PyLong_AsSsize_t(pysize) : -1;
+
+        if (needed < 0) {
+            Py_XDECREF(result);
+            if (PyErr_Occurred())
+                PyErr_PrintEx(1);
+            break;
+        }
+
+        if ((size_t) needed <= size) {
+            /// An invalid keyhash is left to ddspy_serdata_populate_hash
+            if (pykeyhash != Py_None)
+                ddspy_serdata_set_keyhash(this, pykeyhash);
+            Py_DECREF(result);
+            type->size_hint = (uint32_t) needed;
+            this->data_size = (size_t) needed;
+            this->data = data;
+            return true;
+        }
+
+        Py_DECREF(result);
+        free(data);
+        size = (size_t) needed;
+        data = (char*) malloc(size);
+        if (data == NULL)
+            return false;
+    }
+
+    free(data);
+    return false;
+}
+
+
+// Samples written with deferred serialization are only sized with cdr.serialized_size when they are
+// written, which fails for samples that cannot be serialized. The data is left for ddspy_serdata_ensure_data.
+// Caller holds the GIL. Sets data_size, returns false if sizing failed.
+bool ddspy_serdata_measure(ddspy_serdata_t* this, PyObject* sample)
+{
+    PyObject* result = PyObject_CallFunctionObjArgs(sertype(this)->serialized_size_attr, sample, NULL);
+    Py_ssize_t size = result ? PyLong_AsSsize_t(result) : -1;
+    Py_XDECREF(result);
+
+    if (size < 0 || (size_t) size > UINT32_MAX) {
+        if (PyErr_Occurred())
+            PyErr_PrintEx(1);
+        return false;
+    }
+
+    this->data_size = (size_t) size;
+    return true;
+}
+
+
+// Samples written with deferred serialization have no data until it is asked for.
+// Returns whether there is serialized data of the size measured at writing time. A failure
+// is logged once and leaves zeros of that size, which is what is sent.
+bool ddspy_serdata_ensure_data(ddspy_serdata_t* this)
+{
+    if (this->serialize_failed)
+        return false;
+    if (this->data)
+        return true;
+
+    PyGILState_STATE state = PyGILState_Ensure();
+
+    // Another thread may have serialized it while we waited for the GIL
+    if (this->data) {
+        bool serialized = !this->serialize_failed;
+        PyGILState_Release(state);
+        return serialized;
+    }
+
+    /// The keyhash was computed from the sample when it was written. The sample was checked then too,
+    /// this only fails if it was changed after writing in a way that breaks that check.
+    size_t measured = this->data_size;
+    bool serialized = this->sample && ddspy_serdata_serialize(this, this->sample, false);
+    if (serialized && this->data_size != measured) {
+        free(this->data);
+        serialized = false;
+    }
+    if (!serialized) {
+        this->serialize_failed = true;
+        this->data_size = measured;
+        this->data = calloc(1, measured);
+        DDS_ERROR("ddspy: sample of %s changed after it was written with deferred serialization, it is sent as zeros\n",
+                  this->c_data.type->type_name);
+    }
 
     PyGILState_Release(state);
+    return serialized;
+}
+
+
+// The keyhash from the key members at fixed offsets, without the GIL.
+// Returns false if the type or data does not allow it.
+bool ddspy_serdata_layout_hash(ddspy_serdata_t* this)
+{
+    const ddspy_sertype_t* type = csertype(this);
+    const unsigned char* data = (const unsigned char*) this->data;
+
+    if (type->key_fields == NULL || data == NULL || this->data_size < type->key_data_size)
+        return false;
+
+    /// The key is big-endian, little-endian data (odd representation identifier) is swapped.
+    bool swap = (data[1] & 1) != 0;
+    unsigned char key[DDSPY_KEY_LAYOUT_MAX];
+    memset(key, 0, sizeof(key));
+
+    for (uint32_t i = 0; i < type->key_nfields; i++) {
+        const ddspy_key_field_t* field = &type->key_fields[i];
+        if (swap) {
+            for (uint32_t j = 0; j < field->size; j++)
+                key[field->key_offset + j] = data[field->data_offset + field->size - 1 - j];
+        }
+        else {
+            memcpy(key + field->key_offset, data + field->data_offset, field->size);
+        }
+    }
+
+    if (type->key_maxsize_bigger_16) {
+        ddsrt_md5_state_t md5st;
+        ddsrt_md5_init(&md5st);
+        ddsrt_md5_append(&md5st, key, type->key_size);
+        ddsrt_md5_finish(&md5st, this->key.value);
+    }
+    else {
+        memcpy(this->key.value, key, 16);
+    }
+
+    memcpy(&(this->c_data.hash), this->key.value, 4);
+    this->hash_populated = true;
+    return true;
 }
 
 
@@ -221,52 +439,59 @@ void ddspy_serdata_populate_hash(ddspy_serdata_t* this)
         return;
     }
 
-    if (csertype(this)->keyhash_calc_attr == NULL) {
+    if (csertype(this)->keyless) {
+        /// Every sample of a keyless topic has the same, all zero, keyhash
+        memset(this->key.value, 0, 16);
+        this->c_data.hash = 0;
+        this->hash_populated = true;
         return;
     }
 
-    ddspy_serdata_ensure_sample(this);
+    /// SDK_KEY data only holds the key members, not the sample the layout describes
+    if (this->c_data.kind == SDK_DATA && ddspy_serdata_layout_hash(this)) {
+        return;
+    }
 
-    if (!this->sample) {
+    if (csertype(this)->keyhash_calc_attr == NULL) {
         return;
     }
 
     /// Make calls into python possible.
     PyGILState_STATE state = PyGILState_Ensure();
 
-    PyObject* arglist = Py_BuildValue("(O)", this->sample);
-    PyObject* result = PyObject_CallObject(sertype(this)->keyhash_calc_attr, arglist);
-    Py_DECREF(arglist);
+    PyObject* result;
+    if (this->sample) {
+        PyObject* arglist = Py_BuildValue("(O)", this->sample);
+        result = PyObject_CallObject(sertype(this)->keyhash_calc_attr, arglist);
+        Py_DECREF(arglist);
+    }
+    else {
+        /// Without a sample the key members are read from the serialized data, the rest is skipped.
+        /// This is not a copy, python does not keep the memoryview.
+        PyObject* memory = PyMemoryView_FromMemory((char*) this->data, this->data_size, PyBUF_READ);
+        PyObject* arglist = Py_BuildValue("(O)", memory);
+        result = PyObject_CallObject(sertype(this)->keyhash_serialized_attr, arglist);
+        Py_XDECREF(arglist);
+        Py_XDECREF(memory);
+    }
 
     if (result == NULL) {
         // Error condition: This is when python has set an error code, the keyhash is unfilled.
+        // This happens for malformed serialized data, which is not ours to assert on.
         // We won't set hash_populated, but we have to start the python interpreter back up
         if (PyErr_Occurred())
             PyErr_PrintEx(1);
         PyGILState_Release(state);
-        assert(0);
-        return;
-    }
-
-    /// This is not a copy
-    const char* buf = PyBytes_AsString(result);
-    int size = PyBytes_Size(result);
-
-    if (size != 16) {
-        // Error condition: Python did not give us 16 bytes exactly
-        // We won't set hash_populated, but we have to start the python interpreter back up
-        PyGILState_Release(state);
-        assert(0);
         return;
     }
 
-    memcpy(this->key.value, buf, 16);
-    memcpy(&(this->c_data.hash), buf, 4);
-
+    bool populated = ddspy_serdata_set_keyhash(this, result);
     Py_DECREF(result);
 
+    // If the keyhash was not valid we won't set hash_populated, but we have to start the python interpreter back up
     PyGILState_Release(state);
-    this->hash_populated = true;
+    assert(populated);
+    (void) populated;
 }
 
 bool serdata_eqkey(const struct ddsi_serdata* a, const struct ddsi_serdata* b)
@@ -276,6 +501,7 @@ bool serdata_eqkey(const struct ddsi_serdata* a, const struct ddsi_serdata* b)
 
 uint32_t serdata_size(const struct ddsi_serdata* dcmn)
 {
+    /// Deferred samples were sized when they were written, this does not serialize them
     return (uint32_t) cserdata(dcmn)->data_size;
 }
 
@@ -312,14 +538,13 @@ ddsi_serdata_t *serdata_from_ser(
         assert(0); //ddspy_serdata_key_read(d);
         break;
     case SDK_DATA:
-        ddspy_serdata_ensure_sample(d);
+        /// The keyhash comes from the serialized data, the sample is deserialized when it is read
+        ddspy_serdata_populate_hash(d);
         break;
     case SDK_EMPTY:
         assert(0);
     }
 
-    ddspy_serdata_populate_hash(d);
-
     return (ddsi_serdata_t*) d;
 }
 
@@ -349,14 +574,13 @@ ddsi_serdata_t *serdata_from_ser_iov(
         assert(0); //ddspy_serdata_key_read(d);
         break;
     case SDK_DATA:
-        ddspy_serdata_ensure_sample(d);
+        /// The keyhash comes from the serialized data, the sample is deserialized when it is read
+        ddspy_serdata_populate_hash(d);
         break;
     case SDK_EMPTY:
         assert(0);
     }
 
-    ddspy_serdata_populate_hash(d);
-
     return (ddsi_serdata_t*) d;
 }
 
@@ -390,26 +614,20 @@ ddsi_serdata_t *serdata_from_sample(
     {
         case SDK_DATA:
         {
-            PyObject* arglist = Py_BuildValue("(O)", container->sample);
-            // nullcheck
-            PyObject* result = PyObject_CallObject(((const ddspy_sertype_t*) type)->serialize_attr, arglist);
-            // nullcheck
-            Py_DECREF(arglist);
-
-            if (result == NULL) {
-                // Error condition: This is when python has set an error code, no serialization happened.
-                // We won't set hash_populated, but we have to start the python interpreter back up
+            /// Deferred samples are only sized, their keyhash is computed afterwards from the sample.
+            /// Keyed types without a key layout get the keyhash with the data, others compute it afterwards from the data
+            d = ddspy_serdata_new(type, kind, 0);
+            bool valid = container->deferred ?
+                ddspy_serdata_measure(d, container->sample) :
+                ddspy_serdata_serialize(d, container->sample, true);
+
+            if (!valid) {
+                // Error condition: This is when python has set an error code, the sample cannot be serialized.
+                // Returning no serdata fails the write.
+                free(d);
                 PyGILState_Release(state);
                 return NULL;
             }
-
-            /// This is not a copy
-            const char* buf = PyBytes_AsString(result);
-            int size = PyBytes_Size(result);
-
-            d = ddspy_serdata_new(type, kind, size);
-            memcpy((char*) d->data, buf, size);
-            Py_DECREF(result);
         }
         break;
         case SDK_KEY:
@@ -451,6 +669,11 @@ ddsi_serdata_t *serdata_from_sample(
 
 void serdata_to_ser(const ddsi_serdata_t* dcmn, size_t off, size_t sz, void* buf)
 {
+    /// A deferred sample that was changed after writing is sent as zeros, the size cannot change anymore
+    if (!ddspy_serdata_ensure_data(serdata((ddsi_serdata_t*) dcmn)) && cserdata(dcmn)->data == NULL) {
+        memset(buf, 0, sz);
+        return;
+    }
     memcpy(buf, (char*) cserdata(dcmn)->data + off, sz);
 }
 
@@ -458,6 +681,12 @@ ddsi_serdata_t *serdata_to_ser_ref(
   const struct ddsi_serdata* dcmn, size_t off,
   size_t sz, ddsrt_iovec_t* ref)
 {
+    /// A deferred sample that was changed after writing is sent as zeros, the size cannot change anymore
+    if (!ddspy_serdata_ensure_data(serdata((ddsi_serdata_t*) dcmn)) && cserdata(dcmn)->data == NULL) {
+        ref->iov_base = NULL;
+        ref->iov_len = 0;
+        return ddsi_serdata_ref(dcmn);
+    }
     ref->iov_base = (char*) cserdata(dcmn)->data + off;
     ref->iov_len = sz;
     return ddsi_serdata_ref(dcmn);
@@ -469,6 +698,61 @@ void serdata_to_ser_unref(struct ddsi_serdata* dcmn, const ddsrt_iovec_t* ref)
     ddsi_serdata_unref(dcmn);
 }
 
+// Serialized data of a serdata handed to python without a copy, as a buffer that holds
+// a reference to the serdata. Python only sees it through a memoryview.
+typedef struct {
+    PyObject_HEAD
+    ddsi_serdata_t* serdata;
+} ddspy_serdata_buffer_t;
+
+static int serdata_buffer_getbuffer(PyObject *self, Py_buffer *view, int flags)
+{
+    const ddspy_serdata_t* d = cserdata(((ddspy_serdata_buffer_t*) self)->serdata);
+    return PyBuffer_FillInfo(view, self, (void*) d->data, (Py_ssize_t) d->data_size, 1, flags);
+}
+
+static void serdata_buffer_dealloc(PyObject *self)
+{
+    ddsi_serdata_unref(((ddspy_serdata_buffer_t*) self)->serdata);
+    Py_TYPE(self)->tp_free(self);
+}
+
+static PyBufferProcs serdata_buffer_procs = {
+    serdata_buffer_getbuffer,
+    NULL
+};
+
+static PyTypeObject ddspy_serdata_buffer_type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "ddspy.SerdataBuffer",
+    .tp_basicsize = sizeof(ddspy_serdata_buffer_t),
+    .tp_dealloc = serdata_buffer_dealloc,
+    .tp_as_buffer = &serdata_buffer_procs,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_doc = "Serialized data of a sample, kept alive while it is referenced."
+};
+
+/// Takes over the reference to serdata. Returns a memoryview of its data, or None if it has none.
+static PyObject* serdata_memoryview(ddsi_serdata_t* d)
+{
+    if (d->kind != SDK_DATA || !ddspy_serdata_ensure_data(serdata(d))) {
+        ddsi_serdata_unref(d);
+        Py_RETURN_NONE;
+    }
+
+    ddspy_serdata_buffer_t* buffer = PyObject_New(ddspy_serdata_buffer_t, &ddspy_serdata_buffer_type);
+    if (buffer == NULL) {
+        ddsi_serdata_unref(d);
+        return NULL;
+    }
+    buffer->serdata = d;
+
+    PyObject* memory = PyMemoryView_FromObject((PyObject*) buffer);
+    Py_DECREF(buffer);
+    return memory;
+}
+
+
 bool serdata_to_sample(
   ddsi_serdata_t* dcmn, void* sample, void** bufptr,
   void* buflim)
@@ -477,11 +761,36 @@ bool serdata_to_sample(
     (void)buflim;
 
     ddspy_sample_container_t *container = (ddspy_sample_container_t*) sample;
-    ddspy_serdata_ensure_sample(cserdata(dcmn));
+
+    if (container->decoder != NULL) {
+        PyGILState_STATE state = PyGILState_Ensure();
+
+        /// This is not a copy, the memoryview holds a reference to the serdata so the decoder can keep it
+        PyObject* memory = serdata_memoryview(ddsi_serdata_ref(dcmn));
+        PyObject* result = (memory && memory != Py_None) ? PyObject_CallFunctionObjArgs(container->decoder, memory, NULL) : NULL;
+        Py_XDECREF(memory);
+
+        if (result == NULL) {
+            if (PyErr_Occurred())
+                PyErr_PrintEx(1);
+            PyGILState_Release(state);
+            return false;
+        }
+
+        // We already have a ref to result, it goes to the container.
+        container->sample = result;
+        PyGILState_Release(state);
+        return true;
+    }
+
+    if (!ddspy_serdata_ensure_sample(serdata(dcmn)))
+        return false;
 
     // Take a reference for the container
+    PyGILState_STATE state = PyGILState_Ensure();
     container->sample = cserdata(dcmn)->sample;
     py_take_ref(container->sample);
+    PyGILState_Release(state);
 
     return true;
 }
@@ -532,15 +841,25 @@ size_t serdata_print(const struct ddsi_sertype* tpcmn, const struct ddsi_serdata
 {
     (void)tpcmn;
 
-    //ddspy_serdata_ensure_sample(cserdata(dcmn));
+    if (bufsize == 0)
+        return 0;
+    buf[0] = '\0';
+
+    if (!ddspy_serdata_ensure_sample(serdata((ddsi_serdata_t*) dcmn)))
+        return 0;
 
     PyGILState_STATE state = PyGILState_Ensure();
 
     PyObject* repr = PyObject_Repr(cserdata(dcmn)->sample);
-    PyObject* str = PyUnicode_AsEncodedString(repr, "utf-8", "~E~");
-    const char *bytes = PyBytes_AS_STRING(str);
+    PyObject* str = repr ? PyUnicode_AsEncodedString(repr, "utf-8", "~E~") : NULL;
 
-    strncpy(buf, bytes, bufsize);
+    if (str != NULL) {
+        strncpy(buf, PyBytes_AS_STRING(str), bufsize - 1);
+        buf[bufsize - 1] = '\0';
+    }
+    else if (PyErr_Occurred()) {
+        PyErr_Clear();
+    }
 
     Py_XDECREF(repr);
     Py_XDECREF(str);
@@ -593,8 +912,13 @@ void sertype_free(struct ddsi_sertype* tpcmn)
     Py_XDECREF(((ddspy_sertype_t*) tpcmn)->my_py_type);
     Py_XDECREF(((ddspy_sertype_t*) tpcmn)->deserialize_attr);
     Py_XDECREF(((ddspy_sertype_t*) tpcmn)->serialize_attr);
+    Py_XDECREF(((ddspy_sertype_t*) tpcmn)->serialize_into_attr);
+    Py_XDECREF(((ddspy_sertype_t*) tpcmn)->serialize_into_keyhash_attr);
+    Py_XDECREF(((ddspy_sertype_t*) tpcmn)->serialized_size_attr);
     Py_XDECREF(((ddspy_sertype_t*) tpcmn)->key_calc_attr);
     Py_XDECREF(((ddspy_sertype_t*) tpcmn)->keyhash_calc_attr);
+    Py_XDECREF(((ddspy_sertype_t*) tpcmn)->keyhash_serialized_attr);
+    free(((ddspy_sertype_t*) tpcmn)->key_fields);
 
     ddsi_sertype_fini(tpcmn);
 
@@ -609,6 +933,8 @@ void sertype_zero_samples(const struct ddsi_sertype* d, void* _sample, size_t si
 
     for(size_t i = 0; i < size; ++i) {
         (sample+i)->sample = NULL;
+        (sample+i)->decoder = NULL;
+        (sample+i)->deferred = false;
         // TODO: decrease ref here
     }
 
@@ -621,16 +947,22 @@ void sertype_realloc_samples(void** ptrs, const struct ddsi_sertype* d, void* sa
 
     if (sample == NULL) {
         // Initial alloc
-        for(size_t i = 0; i < new; ++i)
+        for(size_t i = 0; i < new; ++i) {
             (newsamples+i)->sample = NULL;
+            (newsamples+i)->decoder = NULL;
+            (newsamples+i)->deferred = false;
+        }
         *ptrs = newsamples;
         return;
     }
     if (new > old) {
         memcpy(newsamples, sample, old * sizeof(ddspy_sample_container_t));
 
-        for(size_t i = old; i < new; ++i)
+        for(size_t i = old; i < new; ++i) {
             (newsamples+i)->sample = NULL;
+            (newsamples+i)->decoder = NULL;
+            (newsamples+i)->deferred = false;
+        }
     }
     else {
         ddspy_sample_container_t* newsamples = (ddspy_sample_container_t*) malloc(new * sizeof(ddspy_sample_container_t));
@@ -656,8 +988,8 @@ bool sertype_equal(const ddsi_sertype_t* acmn, const ddsi_sertype_t* bcmn)
 {
     /// Sertypes are equal if:
     ///    1: they point to the same point in memory (trivial)
-    ///    1: they point to the same python object
-    ///    2: the python objects they point to contain the same type info
+    ///    2: they have the same typehash and point to the same python object
+    /// Python classes only compare equal to themselves, so python is not needed.
 
     const ddspy_sertype_t *A = (const ddspy_sertype_t*) acmn;
     const ddspy_sertype_t *B = (const ddspy_sertype_t*) bcmn;
@@ -668,21 +1000,15 @@ bool sertype_equal(const ddsi_sertype_t* acmn, const ddsi_sertype_t* bcmn)
     if (A->my_py_type == NULL || B->my_py_type == NULL) // should never be true
         return false;
 
-    if (A->my_py_type == B->my_py_type)
-        return true;
-
-    // Expensive stuff coming up here
-    PyGILState_STATE state = PyGILState_Ensure();
-    int result = PyObject_RichCompareBool(A->my_py_type, B->my_py_type, Py_EQ);
-    PyGILState_Release(state);
-
-    return result == 1;
+    return memcmp(A->typehash, B->typehash, 16) == 0 && A->my_py_type == B->my_py_type;
 }
 
 uint32_t sertype_hash(const struct ddsi_sertype* tpcmn)
 {
-  (void)tpcmn;
-  return 0x0;
+    /// The typehash is an md5 that includes the type name, any 4 bytes of it make a good hash
+    uint32_t hash;
+    memcpy(&hash, ((const ddspy_sertype_t*) tpcmn)->typehash, 4);
+    return hash;
 }
 
 
@@ -715,6 +1041,58 @@ bool valid_topic_py_or_set_error(PyObject *py_obj)
 }
 
 
+// Copies the layout of fixed offset key members from cdr.key_layout(), if there is one.
+// Anything unexpected leaves key_fields NULL and the keyhash to python.
+static void ddspy_sertype_key_layout(ddspy_sertype_t* this, PyObject* cdr)
+{
+    this->key_fields = NULL;
+    this->key_nfields = 0;
+    this->key_size = 0;
+    this->key_data_size = 0;
+
+    if (this->keyless)
+        return;
+
+    PyObject* layout = PyObject_CallMethod(cdr, "key_layout", NULL);
+    PyObject* fields = NULL;
+    unsigned int key_size;
+
+    if (layout == NULL || layout == Py_None || !PyArg_ParseTuple(layout, "IO", &key_size, &fields) ||
+            key_size > DDSPY_KEY_LAYOUT_MAX || (fields = PySequence_Fast(fields, "key fields")) == NULL) {
+        PyErr_Clear();
+        Py_XDECREF(layout);
+        return;
+    }
+
+    Py_ssize_t nfields = PySequence_Fast_GET_SIZE(fields);
+    ddspy_key_field_t* key_fields = (ddspy_key_field_t*) malloc(sizeof(ddspy_key_field_t) * (nfields ? nfields : 1));
+    uint32_t data_size = 0;
+
+    for (Py_ssize_t i = 0; i < nfields; i++) {
+        ddspy_key_field_t* field = &key_fields[i];
+        if (!PyArg_ParseTuple(PySequence_Fast_GET_ITEM(fields, i), "III", &field->data_offset, &field->key_offset, &field->size) ||
+                field->key_offset + field->size > key_size) {
+            PyErr_Clear();
+            free(key_fields);
+            key_fields = NULL;
+            break;
+        }
+        if (field->data_offset + field->size > data_size)
+            data_size = field->data_offset + field->size;
+    }
+
+    Py_DECREF(fields);
+    Py_DECREF(layout);
+
+    if (key_fields != NULL) {
+        this->key_fields = key_fields;
+        this->key_nfields = (uint32_t) nfields;
+        this->key_size = key_size;
+        this->key_data_size = data_size;
+    }
+}
+
+
 ddspy_sertype_t *ddspy_sertype_new(PyObject *pytype)
 {
     ddspy_sertype_t *new = (ddspy_sertype_t*) malloc(sizeof(ddspy_sertype_t));
@@ -753,16 +1131,33 @@ ddspy_sertype_t *ddspy_sertype_new(PyObject *pytype)
     Py_DECREF(finalize);
     Py_XDECREF(result);
 
+    new->keyless = keyless;
     new->deserialize_attr = PyObject_GetAttrString(cdr, "deserialize");
     new->serialize_attr = PyObject_GetAttrString(cdr, "serialize");
+    new->serialize_into_attr = PyObject_GetAttrString(cdr, "serialize_into");
+    new->serialized_size_attr = PyObject_GetAttrString(cdr, "serialized_size");
     new->key_calc_attr = PyObject_GetAttrString(cdr, "key");
-    new->keyhash_calc_attr = PyObject_GetAttrString(cdr, "keyhash");
+    new->size_hint = 256;
 
     if (!valid_topic_py_or_set_error(new->deserialize_attr) ||
         !valid_topic_py_or_set_error(new->serialize_attr) ||
-        !valid_topic_py_or_set_error(new->key_calc_attr) ||
-        !valid_topic_py_or_set_error(new->keyhash_calc_attr)) 
+        !valid_topic_py_or_set_error(new->serialize_into_attr) ||
+        !valid_topic_py_or_set_error(new->serialized_size_attr) ||
+        !valid_topic_py_or_set_error(new->key_calc_attr))
         return NULL;
+
+    /// The keyhash of keyless topics is constant, python is never asked for it
+    new->keyhash_calc_attr = NULL;
+    new->keyhash_serialized_attr = NULL;
+
+    if (!keyless) {
+        new->keyhash_calc_attr = PyObject_GetAttrString(cdr, "keyhash");
+        new->keyhash_serialized_attr = PyObject_GetAttrString(cdr, "keyhash_from_serialized");
+
+        if (!valid_topic_py_or_set_error(new->keyhash_calc_attr) ||
+            !valid_topic_py_or_set_error(new->keyhash_serialized_attr))
+            return NULL;
+    }
     
     PyObject* pykeysize = PyObject_GetAttrString(cdr, "key_max_size");
     if (!valid_topic_py_or_set_error(pykeysize)) return NULL;
@@ -776,8 +1171,29 @@ ddspy_sertype_t *ddspy_sertype_new(PyObject *pytype)
         new->key_maxsize_bigger_16 = true;
     }
     else {
-        new->key_maxsize_bigger_16 = keysize > 16;
+        // The key is preceded by the 4 byte CDR header
+        new->key_maxsize_bigger_16 = keysize + 4 > 16;
+    }
+
+    ddspy_sertype_key_layout(new, cdr);
+
+    /// Keyed types without a key layout get the keyhash from the call that serializes, python is called once per write
+    new->serialize_into_keyhash_attr = NULL;
+    if (!keyless && new->key_fields == NULL) {
+        new->serialize_into_keyhash_attr = PyObject_GetAttrString(cdr, "serialize_into_with_keyhash");
+        if (!valid_topic_py_or_set_error(new->serialize_into_keyhash_attr)) return NULL;
+    }
+
+    PyObject* pytypehash = PyObject_CallMethod(cdr, "typehash", NULL);
+    if (!valid_topic_py_or_set_error(pytypehash)) return NULL;
+
+    if (!PyBytes_Check(pytypehash) || PyBytes_Size(pytypehash) != 16) {
+        Py_DECREF(pytypehash);
+        PyErr_SetString(PyExc_TypeError, "Invalid typehash of topic datatype.");
+        return NULL;
     }
+    memcpy(new->typehash, PyBytes_AS_STRING(pytypehash), 16);
+    Py_DECREF(pytypehash);
 
     Py_DECREF(cdr);
 
@@ -807,9 +1223,12 @@ ddspy_topic_create(PyObject *self, PyObject *args)
     if (qospy != Py_None) qos = PyLong_AsVoidPtr(qospy);
 
     ddspy_sertype_t *sertype = ddspy_sertype_new(datatype);
+    if (sertype == NULL) return NULL;
     ddsi_sertype_t *rsertype = (ddsi_sertype_t*) sertype;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_create_topic_sertype(participant, name, (void**) &rsertype, qos, listener, NULL);
+    Py_END_ALLOW_THREADS
 
     if (PyErr_Occurred()) return NULL;
     
@@ -819,14 +1238,18 @@ ddspy_topic_create(PyObject *self, PyObject *args)
 static PyObject *
 ddspy_write(PyObject *self, PyObject *args)
 {
-    ddspy_sample_container_t container;
+    ddspy_sample_container_t container = {NULL, NULL, false};
     dds_entity_t writer;
     dds_return_t sts;
+    int deferred = 0;
 
-    if (!PyArg_ParseTuple(args, "iO", &writer, &container.sample))
+    if (!PyArg_ParseTuple(args, "iO|p", &writer, &container.sample, &deferred))
         return NULL;
+    container.deferred = deferred;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_write(writer, &container);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -834,15 +1257,158 @@ ddspy_write(PyObject *self, PyObject *args)
 static PyObject *
 ddspy_write_ts(PyObject *self, PyObject *args)
 {
-    ddspy_sample_container_t container;
+    ddspy_sample_container_t container = {NULL, NULL, false};
     dds_entity_t writer;
     dds_return_t sts;
     dds_time_t time;
+    int deferred = 0;
 
-    if (!PyArg_ParseTuple(args, "iOL", &writer, &container.sample, &time))
+    if (!PyArg_ParseTuple(args, "iOL|p", &writer, &container.sample, &time, &deferred))
         return NULL;
+    container.deferred = deferred;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_write_ts(writer, &container, time);
+    Py_END_ALLOW_THREADS
+
+    return PyLong_FromLong((long) sts);
+}
+
+static PyObject *
+ddspy_write_many(PyObject *self, PyObject *args)
+{
+    dds_entity_t writer;
+    PyObject* samples;
+    PyObject* timestamps = Py_None;
+    int deferred = 0;
+
+    if (!PyArg_ParseTuple(args, "iO|Op", &writer, &samples, &timestamps, &deferred))
+        return NULL;
+
+    /// A tuple holds a reference to every sample while the GIL is released, a list could be changed meanwhile
+    PyObject* tuple = PySequence_Tuple(samples);
+    if (tuple == NULL)
+        return NULL;
+
+    Py_ssize_t N = PyTuple_GET_SIZE(tuple);
+    dds_time_t* times = NULL;
+
+    /// Every timestamp is converted before anything is written, a bad one fails the whole call
+    if (timestamps != Py_None) {
+        PyObject* fast_timestamps = PySequence_Fast(timestamps, "Timestamps must be iterable.");
+        if (fast_timestamps != NULL && PySequence_Fast_GET_SIZE(fast_timestamps) != N) {
+            PyErr_SetString(PyExc_ValueError, "There must be one timestamp per sample.");
+            Py_CLEAR(fast_timestamps);
+        }
+
+        times = fast_timestamps ? malloc(sizeof(dds_time_t) * (N ? N : 1)) : NULL;
+        if (fast_timestamps != NULL && times == NULL)
+            PyErr_NoMemory();
+
+        for (Py_ssize_t i = 0; times != NULL && i < N; ++i) {
+            times[i] = PyLong_AsLongLong(PySequence_Fast_GET_ITEM(fast_timestamps, i));
+            if (times[i] == -1 && PyErr_Occurred()) {
+                free(times);
+                times = NULL;
+            }
+        }
+
+        Py_XDECREF(fast_timestamps);
+        if (times == NULL) {
+            Py_DECREF(tuple);
+            return NULL;
+        }
+    }
+
+    dds_return_t* sts = malloc(sizeof(dds_return_t) * (N ? N : 1));
+    if (sts == NULL) {
+        free(times);
+        Py_DECREF(tuple);
+        return PyErr_NoMemory();
+    }
+
+    /// One return code per sample, a sample that fails does not stop the others
+    Py_BEGIN_ALLOW_THREADS
+    for (Py_ssize_t i = 0; i < N; ++i) {
+        ddspy_sample_container_t container = {PyTuple_GET_ITEM(tuple, i), NULL, deferred};
+        if (times != NULL)
+            sts[i] = dds_write_ts(writer, &container, times[i]);
+        else
+            sts[i] = dds_write(writer, &container);
+    }
+    Py_END_ALLOW_THREADS
+
+    PyObject* list = PyList_New(N);
+    for (Py_ssize_t i = 0; list != NULL && i < N; ++i) {
+        PyObject* pysts = PyLong_FromLong((long) sts[i]);
+        if (pysts == NULL)
+            Py_CLEAR(list);
+        else
+            PyList_SET_ITEM(list, i, pysts);
+    }
+
+    free(sts);
+    free(times);
+    Py_DECREF(tuple);
+    return list;
+}
+
+static PyObject *
+ddspy_write_serialized(PyObject *self, PyObject *args)
+{
+    dds_entity_t writer;
+    Py_buffer data;
+    PyObject* timestamp = Py_None;
+    const struct ddsi_sertype* type;
+    dds_time_t time = 0;
+    dds_return_t sts;
+
+    if (!PyArg_ParseTuple(args, "iy*|O", &writer, &data, &timestamp))
+        return NULL;
+
+    if (timestamp != Py_None) {
+        time = PyLong_AsLongLong(timestamp);
+        if (time == -1 && PyErr_Occurred()) {
+            PyBuffer_Release(&data);
+            return NULL;
+        }
+    }
+
+    if (data.len < 4) {
+        PyBuffer_Release(&data);
+        PyErr_SetString(PyExc_ValueError, "Serialized data starts with a 4 byte encapsulation header.");
+        return NULL;
+    }
+
+    sts = dds_get_entity_sertype(writer, &type);
+    if (sts < 0) {
+        PyBuffer_Release(&data);
+        return PyLong_FromLong((long) sts);
+    }
+
+    /// The data is copied into the serdata and the keyhash is computed from it, like received data
+    ddsrt_iovec_t iov;
+    iov.iov_base = data.buf;
+    iov.iov_len = (ddsrt_iov_len_t) data.len;
+    ddsi_serdata_t* d = serdata_from_ser_iov(type, SDK_DATA, 1, &iov, (size_t) data.len);
+    PyBuffer_Release(&data);
+
+    if (!serdata(d)->hash_populated) {
+        ddsi_serdata_unref(d);
+        PyErr_SetString(PyExc_ValueError, "Could not read the key of the serialized data.");
+        return NULL;
+    }
+
+    /// Both take over our reference to the serdata, forwardcdr keeps the timestamp we set.
+    Py_BEGIN_ALLOW_THREADS
+    if (timestamp != Py_None) {
+        d->timestamp.v = time;
+        sts = dds_forwardcdr(writer, d);
+    }
+    else {
+        sts = dds_writecdr(writer, d);
+    }
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -850,14 +1416,16 @@ ddspy_write_ts(PyObject *self, PyObject *args)
 static PyObject *
 ddspy_dispose(PyObject *self, PyObject *args)
 {
-    ddspy_sample_container_t container;
+    ddspy_sample_container_t container = {NULL, NULL, false};
     dds_entity_t writer;
     dds_return_t sts;
 
     if (!PyArg_ParseTuple(args, "iO", &writer, &container.sample))
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_dispose(writer, &container);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -865,7 +1433,7 @@ ddspy_dispose(PyObject *self, PyObject *args)
 static PyObject *
 ddspy_dispose_ts(PyObject *self, PyObject *args)
 {
-    ddspy_sample_container_t container;
+    ddspy_sample_container_t container = {NULL, NULL, false};
     dds_entity_t writer;
     dds_return_t sts;
     dds_time_t time;
@@ -873,7 +1441,9 @@ ddspy_dispose_ts(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iOL", &writer, &container.sample, &time))
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_dispose_ts(writer, &container, time);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -881,14 +1451,16 @@ ddspy_dispose_ts(PyObject *self, PyObject *args)
 static PyObject *
 ddspy_writedispose(PyObject *self, PyObject *args)
 {
-    ddspy_sample_container_t container;
+    ddspy_sample_container_t container = {NULL, NULL, false};
     dds_entity_t writer;
     dds_return_t sts;
 
     if (!PyArg_ParseTuple(args, "iO", &writer, &container.sample))
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_writedispose(writer, &container);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -896,7 +1468,7 @@ ddspy_writedispose(PyObject *self, PyObject *args)
 static PyObject *
 ddspy_writedispose_ts(PyObject *self, PyObject *args)
 {
-    ddspy_sample_container_t container;
+    ddspy_sample_container_t container = {NULL, NULL, false};
     dds_entity_t writer;
     dds_return_t sts;
     dds_time_t time;
@@ -904,7 +1476,9 @@ ddspy_writedispose_ts(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iOL", &writer, &container.sample, &time))
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_writedispose_ts(writer, &container, time);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -919,7 +1493,9 @@ ddspy_dispose_handle(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iK", &writer, &handle))
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_dispose_ih(writer, handle);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -935,14 +1511,17 @@ ddspy_dispose_handle_ts(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iKL", &writer, &handle, &time))
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_dispose_ih_ts(writer, handle, time);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
 
 static PyObject * sampleinfo_descriptor;
+static PyObject * invalidsample_descriptor;
 
-static void set_sampleinfo_attribute(PyObject *sample, dds_sample_info_t *sampleinfo)
+static PyObject* make_sampleinfo(dds_sample_info_t *sampleinfo)
 {
     PyObject* arguments = Py_BuildValue("IIIOLKKkkkkk",
         sampleinfo->sample_state,
@@ -960,12 +1539,20 @@ static void set_sampleinfo_attribute(PyObject *sample, dds_sample_info_t *sample
     );
     PyObject *pysampleinfo = PyObject_CallObject(sampleinfo_descriptor, arguments);
     Py_DECREF(arguments);
+    return pysampleinfo;
+}
+
+static void set_sampleinfo_attribute(PyObject *sample, dds_sample_info_t *sampleinfo)
+{
+    PyObject *pysampleinfo = make_sampleinfo(sampleinfo);
     PyObject_SetAttrString(sample, "sample_info", pysampleinfo);
     Py_DECREF(pysampleinfo);
 }
 
+
+/// A list of (memoryview, sample_info) for read_raw and take_raw, no python samples are made.
 static PyObject *
-ddspy_read(PyObject *self, PyObject *args)
+ddspy_readcdr_impl(PyObject *args, bool take)
 {
     long long N;
     dds_entity_t reader;
@@ -974,167 +1561,258 @@ ddspy_read(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iL", &reader, &N))
         return NULL;
 
-    if (N <= 0) {
+    if (N <= 0 || N > INT32_MAX) {
         PyErr_SetString(PyExc_TypeError, "N should be a positive integer");
         return NULL;
     }
 
     dds_sample_info_t* info = malloc(sizeof(dds_sample_info_t) * N);
-    ddspy_sample_container_t* container = malloc(sizeof(ddspy_sample_container_t) * N);
-    ddspy_sample_container_t** rcontainer = malloc(sizeof(ddspy_sample_container_t*) * N);
-
-    for(int i = 0; i < N; ++i) {
-        rcontainer[i] = &container[i];
+    ddsi_serdata_t** serdatas = malloc(sizeof(ddsi_serdata_t*) * N);
+    if (info == NULL || serdatas == NULL) {
+        free(info);
+        free(serdatas);
+        return PyErr_NoMemory();
     }
 
-    sts = dds_read(reader, rcontainer, info, N, N);
+    Py_BEGIN_ALLOW_THREADS
+    if (take)
+        sts = dds_takecdr(reader, serdatas, (uint32_t) N, info, 0);
+    else
+        sts = dds_readcdr(reader, serdatas, (uint32_t) N, info, 0);
+    Py_END_ALLOW_THREADS
+
     if (sts < 0) {
+        free(info);
+        free(serdatas);
         return PyLong_FromLong((long) sts);
     }
 
     PyObject* list = PyList_New(sts);
 
     for(int i = 0; i < sts; ++i) {
-        set_sampleinfo_attribute(container[i].sample, &info[i]);
-        PyList_SetItem(list, i, container[i].sample);
-        py_return_ref(container[i].sample);
+        /// Every serdata reference goes to its memoryview, also when something failed before
+        PyObject* memory = serdata_memoryview(serdatas[i]);
+        PyObject* pysampleinfo = (list && memory) ? make_sampleinfo(&info[i]) : NULL;
+        PyObject* item = pysampleinfo ? PyTuple_Pack(2, memory, pysampleinfo) : NULL;
+        Py_XDECREF(memory);
+        Py_XDECREF(pysampleinfo);
+
+        if (item == NULL)
+            Py_CLEAR(list);
+        else
+            PyList_SET_ITEM(list, i, item);
     }
     free(info);
-    free(container);
-    free(rcontainer);
+    free(serdatas);
 
     return list;
 }
 
+static PyObject *
+ddspy_read_raw(PyObject *self, PyObject *args)
+{
+    return ddspy_readcdr_impl(args, false);
+}
 
 static PyObject *
-ddspy_take(PyObject *self, PyObject *args)
+ddspy_take_raw(PyObject *self, PyObject *args)
 {
-    long long N;
-    dds_entity_t reader;
-    dds_return_t sts;
+    return ddspy_readcdr_impl(args, true);
+}
 
-    if (!PyArg_ParseTuple(args, "iL", &reader, &N))
-        return NULL;
+// Scratch memory for read and take of one reader, kept between calls and grown on demand.
+// A reader read from several threads at once gets temporary memory for the overlapping calls.
+typedef struct ddspy_arena {
+    long long size;
+    bool in_use;
+    dds_sample_info_t* info;
+    ddspy_sample_container_t* container;
+    ddspy_sample_container_t** rcontainer;
+} ddspy_arena_t;
 
-    if (N <= 0) {
-        PyErr_SetString(PyExc_TypeError, "N should be a positive integer");
-        return NULL;
-    }
+// Reads of more samples than this get temporary memory, so one large read does not pin it
+#define DDSPY_ARENA_MAX 4096
 
-    dds_sample_info_t* info = malloc(sizeof(dds_sample_info_t) * N);
-    ddspy_sample_container_t* container = malloc(sizeof(ddspy_sample_container_t) * N);
-    ddspy_sample_container_t** rcontainer = malloc(sizeof(ddspy_sample_container_t*) * N);
+static void arena_free_arrays(ddspy_arena_t* arena)
+{
+    free(arena->info);
+    free(arena->container);
+    free(arena->rcontainer);
+    arena->info = NULL;
+    arena->container = NULL;
+    arena->rcontainer = NULL;
+    arena->size = 0;
+}
 
-    for(int i = 0; i < N; ++i) {
-        rcontainer[i] = &container[i];
+static void arena_capsule_destructor(PyObject* capsule)
+{
+    ddspy_arena_t* arena = (ddspy_arena_t*) PyCapsule_GetPointer(capsule, "ddspy_arena");
+    if (arena != NULL) {
+        arena_free_arrays(arena);
+        free(arena);
     }
+}
 
-    sts = dds_take(reader, rcontainer, info, N, N);
-    if (sts < 0) {
-        return PyLong_FromLong((long) sts);
-    }
+static PyObject *
+ddspy_arena_new(PyObject *self, PyObject *args)
+{
+    ddspy_arena_t* arena = (ddspy_arena_t*) calloc(1, sizeof(ddspy_arena_t));
+    if (arena == NULL)
+        return PyErr_NoMemory();
+
+    PyObject* capsule = PyCapsule_New(arena, "ddspy_arena", arena_capsule_destructor);
+    if (capsule == NULL)
+        free(arena);
+    return capsule;
+}
 
-    PyObject* list = PyList_New(sts);
+/// The arena in capsule if it is not in use, otherwise local, with room for N samples.
+/// Called with the GIL held, which protects in_use.
+static ddspy_arena_t* arena_acquire(PyObject* capsule, ddspy_arena_t* local, long long N)
+{
+    ddspy_arena_t* arena = NULL;
 
-    for(int i = 0; i < sts; ++i) {
-        set_sampleinfo_attribute(container[i].sample, &info[i]);
-        PyList_SetItem(list, i, container[i].sample);
-        py_return_ref(container[i].sample);
+    if (capsule != NULL && N <= DDSPY_ARENA_MAX && PyCapsule_IsValid(capsule, "ddspy_arena"))
+        arena = (ddspy_arena_t*) PyCapsule_GetPointer(capsule, "ddspy_arena");
+
+    if (arena == NULL || arena->in_use) {
+        memset(local, 0, sizeof(ddspy_arena_t));
+        arena = local;
     }
-    free(info);
-    free(container);
-    free(rcontainer);
 
-    return list;
+    if (arena->size < N) {
+        /// On failure the arrays that did grow are kept, the old size is still valid for all of them
+        dds_sample_info_t* info = realloc(arena->info, sizeof(dds_sample_info_t) * N);
+        if (info != NULL) arena->info = info;
+        ddspy_sample_container_t* container = realloc(arena->container, sizeof(ddspy_sample_container_t) * N);
+        if (container != NULL) arena->container = container;
+        ddspy_sample_container_t** rcontainer = realloc(arena->rcontainer, sizeof(ddspy_sample_container_t*) * N);
+        if (rcontainer != NULL) arena->rcontainer = rcontainer;
+
+        if (info == NULL || container == NULL || rcontainer == NULL) {
+            if (arena == local)
+                arena_free_arrays(local);
+            PyErr_NoMemory();
+            return NULL;
+        }
+        arena->size = N;
+    }
+
+    arena->in_use = true;
+    return arena;
 }
 
+static void arena_release(ddspy_arena_t* arena, ddspy_arena_t* local)
+{
+    if (arena == local)
+        arena_free_arrays(local);
+    else
+        arena->in_use = false;
+}
 
 static PyObject *
-ddspy_read_handle(PyObject *self, PyObject *args)
+ddspy_read_impl(PyObject *args, bool take, bool instance)
 {
     long long N;
     dds_entity_t reader;
     dds_return_t sts;
-    dds_instance_handle_t handle;
-
-    if (!PyArg_ParseTuple(args, "iLK", &reader, &N, &handle))
+    dds_instance_handle_t handle = 0;
+    PyObject* decoder = NULL;
+    PyObject* capsule = NULL;
+    ddspy_arena_t local;
+
+    if (instance) {
+        if (!PyArg_ParseTuple(args, "iLK|OO", &reader, &N, &handle, &decoder, &capsule))
+            return NULL;
+    }
+    else if (!PyArg_ParseTuple(args, "iL|OO", &reader, &N, &decoder, &capsule))
         return NULL;
 
-    if (N <= 0) {
+    if (decoder == Py_None) decoder = NULL;
+
+    if (N <= 0 || N > INT32_MAX) {
         PyErr_SetString(PyExc_TypeError, "N should be a positive integer");
         return NULL;
     }
 
-    dds_sample_info_t* info = malloc(sizeof(dds_sample_info_t) * N);
-    ddspy_sample_container_t* container = malloc(sizeof(ddspy_sample_container_t) * N);
-    ddspy_sample_container_t** rcontainer = malloc(sizeof(ddspy_sample_container_t*) * N);
+    ddspy_arena_t* arena = arena_acquire(capsule, &local, N);
+    if (arena == NULL)
+        return NULL;
 
     for(int i = 0; i < N; ++i) {
-        rcontainer[i] = &container[i];
+        arena->container[i].sample = NULL;
+        arena->container[i].decoder = decoder;
+        arena->container[i].deferred = false;
+        arena->rcontainer[i] = &arena->container[i];
     }
 
-    sts = dds_read_instance(reader, rcontainer, info, N, N, handle);
+    Py_BEGIN_ALLOW_THREADS
+    if (instance && take)
+        sts = dds_take_instance(reader, (void**) arena->rcontainer, arena->info, N, N, handle);
+    else if (instance)
+        sts = dds_read_instance(reader, (void**) arena->rcontainer, arena->info, N, N, handle);
+    else if (take)
+        sts = dds_take(reader, (void**) arena->rcontainer, arena->info, N, N);
+    else
+        sts = dds_read(reader, (void**) arena->rcontainer, arena->info, N, N);
+    Py_END_ALLOW_THREADS
+
     if (sts < 0) {
+        arena_release(arena, &local);
         return PyLong_FromLong((long) sts);
     }
 
     PyObject* list = PyList_New(sts);
 
     for(int i = 0; i < sts; ++i) {
-        set_sampleinfo_attribute(container[i].sample, &info[i]);
-        PyList_SetItem(list, i, container[i].sample);
-        py_return_ref(container[i].sample);
+        PyObject* sample = arena->container[i].sample;
+        if (sample == NULL) {
+            /// Samples without data, or that could not be deserialized, still carry their sample info
+            PyObject* pysampleinfo = make_sampleinfo(&arena->info[i]);
+            sample = pysampleinfo ? PyObject_CallFunctionObjArgs(invalidsample_descriptor, pysampleinfo, NULL) : NULL;
+            Py_XDECREF(pysampleinfo);
+        }
+        else {
+            set_sampleinfo_attribute(sample, &arena->info[i]);
+        }
+
+        /// The reference of the container goes to the list
+        if (list != NULL && sample != NULL) {
+            PyList_SET_ITEM(list, i, sample);
+            py_return_ref(sample);
+        }
+        else {
+            Py_XDECREF(sample);
+            Py_CLEAR(list);
+        }
     }
-    free(info);
-    free(container);
-    free(rcontainer);
 
+    arena_release(arena, &local);
     return list;
 }
 
-
 static PyObject *
-ddspy_take_handle(PyObject *self, PyObject *args)
+ddspy_read(PyObject *self, PyObject *args)
 {
-    long long N;
-    dds_entity_t reader;
-    dds_return_t sts;
-    dds_instance_handle_t handle;
-
-    if (!PyArg_ParseTuple(args, "iLK", &reader, &N, &handle))
-        return NULL;
-
-    if (N <= 0) {
-        PyErr_SetString(PyExc_TypeError, "N should be a positive integer");
-        return NULL;
-    }
-
-    dds_sample_info_t* info = malloc(sizeof(dds_sample_info_t) * N);
-    ddspy_sample_container_t* container = malloc(sizeof(ddspy_sample_container_t) * N);
-    ddspy_sample_container_t** rcontainer = malloc(sizeof(ddspy_sample_container_t*) * N);
-
-    for(int i = 0; i < N; ++i) {
-        rcontainer[i] = &container[i];
-    }
-
-    sts = dds_take_instance(reader, rcontainer, info, N, N, handle);
-    if (sts < 0) {
-        return PyLong_FromLong((long) sts);
-    }
+    return ddspy_read_impl(args, false, false);
+}
 
-    PyObject* list = PyList_New(sts);
+static PyObject *
+ddspy_take(PyObject *self, PyObject *args)
+{
+    return ddspy_read_impl(args, true, false);
+}
 
-    for(int i = 0; i < sts; ++i) {
-        set_sampleinfo_attribute(container[i].sample, &info[i]);
-        PyList_SetItem(list, i, container[i].sample);
-        py_return_ref(container[i].sample);
-    }
-    free(info);
-    free(container);
-    free(rcontainer);
+static PyObject *
+ddspy_read_handle(PyObject *self, PyObject *args)
+{
+    return ddspy_read_impl(args, false, true);
+}
 
-    return list;
+static PyObject *
+ddspy_take_handle(PyObject *self, PyObject *args)
+{
+    return ddspy_read_impl(args, true, true);
 }
 
 static PyObject *
@@ -1143,12 +1821,14 @@ ddspy_register_instance(PyObject *self, PyObject *args)
     dds_entity_t writer;
     dds_instance_handle_t handle;
     dds_return_t sts;
-    ddspy_sample_container_t container;
+    ddspy_sample_container_t container = {NULL, NULL, false};
 
     if (!PyArg_ParseTuple(args, "iO", &writer, &container.sample))
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_register_instance(writer, &handle, &container);
+    Py_END_ALLOW_THREADS
 
     if (sts < 0) {
         return PyLong_FromLong((long) sts);
@@ -1162,12 +1842,14 @@ ddspy_unregister_instance(PyObject *self, PyObject *args)
 {
     dds_entity_t writer;
     dds_return_t sts;
-    ddspy_sample_container_t container;
+    ddspy_sample_container_t container = {NULL, NULL, false};
 
     if (!PyArg_ParseTuple(args, "iO", &writer, &container.sample))
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_unregister_instance(writer, &container);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -1183,7 +1865,9 @@ ddspy_unregister_instance_handle(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iK", &writer, &handle))
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_unregister_instance_ih(writer, handle);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -1194,13 +1878,15 @@ ddspy_unregister_instance_ts(PyObject *self, PyObject *args)
 {
     dds_entity_t writer;
     dds_return_t sts;
-    ddspy_sample_container_t container;
+    ddspy_sample_container_t container = {NULL, NULL, false};
     dds_time_t time;
 
     if (!PyArg_ParseTuple(args, "iOL", &writer, &container.sample, &time))
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_unregister_instance_ts(writer, &container, time);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -1217,7 +1903,9 @@ ddspy_unregister_instance_handle_ts(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iKL", &writer, &handle, &time))
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_unregister_instance_ih_ts(writer, handle, time);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -1228,12 +1916,14 @@ ddspy_lookup_instance(PyObject *self, PyObject *args)
 {
     dds_entity_t entity;
     dds_return_t sts;
-    ddspy_sample_container_t container;
+    ddspy_sample_container_t container = {NULL, NULL, false};
 
     if (!PyArg_ParseTuple(args, "iO", &entity, &container.sample))
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_lookup_instance(entity, &container);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -1244,7 +1934,7 @@ ddspy_read_next(PyObject *self, PyObject *args)
     dds_entity_t reader;
     dds_return_t sts;
     dds_sample_info_t info;
-    ddspy_sample_container_t container;
+    ddspy_sample_container_t container = {NULL, NULL, false};
     ddspy_sample_container_t* pt_container;
 
     if (!PyArg_ParseTuple(args, "i", &reader))
@@ -1252,7 +1942,9 @@ ddspy_read_next(PyObject *self, PyObject *args)
 
     pt_container = &container;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_read_next(reader, &pt_container, &info);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
         return PyLong_FromLong((long) sts);
     }
@@ -1273,7 +1965,7 @@ ddspy_take_next(PyObject *self, PyObject *args)
     dds_entity_t reader;
     dds_return_t sts;
     dds_sample_info_t info;
-    ddspy_sample_container_t container;
+    ddspy_sample_container_t container = {NULL, NULL, false};
     ddspy_sample_container_t* pt_container;
 
     if (!PyArg_ParseTuple(args, "i", &reader))
@@ -1281,7 +1973,9 @@ ddspy_take_next(PyObject *self, PyObject *args)
 
     pt_container = &container;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_take_next(reader, &pt_container, &info);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
         return PyLong_FromLong((long) sts);
     }
@@ -1313,6 +2007,18 @@ PyMethodDef ddspy_funcs[] = {
 		(PyCFunction)ddspy_take,
 		METH_VARARGS,
 		ddspy_docs},
+    {	"ddspy_arena_new",
+		(PyCFunction)ddspy_arena_new,
+		METH_NOARGS,
+		ddspy_docs},
+    {	"ddspy_read_raw",
+		(PyCFunction)ddspy_read_raw,
+		METH_VARARGS,
+		ddspy_docs},
+    {	"ddspy_take_raw",
+		(PyCFunction)ddspy_take_raw,
+		METH_VARARGS,
+		ddspy_docs},
     {	"ddspy_read_handle",
 		(PyCFunction)ddspy_read_handle,
 		METH_VARARGS,
@@ -1329,6 +2035,14 @@ PyMethodDef ddspy_funcs[] = {
 		(PyCFunction)ddspy_write_ts,
 		METH_VARARGS,
 		ddspy_docs},
+    {	"ddspy_write_many",
+		(PyCFunction)ddspy_write_many,
+		METH_VARARGS,
+		ddspy_docs},
+    {	"ddspy_write_serialized",
+		(PyCFunction)ddspy_write_serialized,
+		METH_VARARGS,
+		ddspy_docs},
     {	"ddspy_writedispose",
 		(PyCFunction)ddspy_writedispose,
 		METH_VARARGS,
@@ -1405,5 +2119,8 @@ PyModuleDef ddspy_mod = {
 PyMODINIT_FUNC PyInit_ddspy(void) {
     PyObject* import = PyImport_ImportModule("cyclonedds.internal"); 
     sampleinfo_descriptor = PyObject_GetAttrString(import, "SampleInfo");
+    invalidsample_descriptor = PyObject_GetAttrString(import, "InvalidSample");
+    if (PyType_Ready(&ddspy_serdata_buffer_type) < 0)
+        return NULL;
 	return PyModule_Create(&ddspy_mod);
 }
\ No newline at end of file
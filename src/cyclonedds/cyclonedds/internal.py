@@ -180,6 +180,13 @@ class SampleInfo:
     absolute_generation_rank: int
 
 
+@dataclass
+class InvalidSample:
+    """Returned by read and take for a sample without data, like a dispose or unregister notification,
+    or for a sample that could not be deserialized. Only its sample_info is known."""
+    sample_info: SampleInfo
+
+
 class dds_c_t:  # noqa N801
     entity = ct.c_int32
     time = ct.c_int64
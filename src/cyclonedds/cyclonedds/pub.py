@@ -21,8 +21,19 @@ from .qos import _CQos
 # But the import here allows your static type checker to resolve fully qualified cyclonedds names
 if TYPE_CHECKING:
     import cyclonedds
-    ddspy_write = lambda e, s: None
-    ddspy_write_ts = lambda e, s, t: None
+
+    def ddspy_write(e, s, d=False):
+        return None
+
+    def ddspy_write_ts(e, s, t, d=False):
+        return None
+
+    def ddspy_write_many(e, s, t=None, d=False):
+        return []
+
+    def ddspy_write_serialized(e, s, t=None):
+        return None
+
     ddspy_dispose = lambda e, s: None
     ddspy_dispose_ts = lambda e, s, t: None
     ddspy_dispose_handle = lambda e, s: None
@@ -39,7 +50,7 @@ else:
     from ddspy import ddspy_write, ddspy_write_ts, ddspy_dispose, ddspy_writedispose, ddspy_writedispose_ts, \
         ddspy_dispose_handle, ddspy_dispose_handle_ts, ddspy_register_instance, ddspy_unregister_instance, \
         ddspy_unregister_instance_handle, ddspy_unregister_instance_ts, ddspy_unregister_instance_handle_ts, \
-        ddspy_lookup_instance
+        ddspy_lookup_instance, ddspy_write_many, ddspy_write_serialized
 
 
 class Publisher(Entity):
@@ -99,7 +110,17 @@ class Publisher(Entity):
 
 
 class DataWriter(Entity):
-    def __init__(self, publisher: 'cyclonedds.pub.Publisher', topic: 'cyclonedds.topic.Topic', qos=None, listener=None):
+    """Writes samples of a topic.
+
+    With defer_serialization samples are only serialized when they are sent over the network,
+    samples that only reach readers in this process are passed on as is. write() still sizes the
+    sample, a sample that cannot be serialized fails the write. The sample object itself is kept
+    and must not be changed after write(): local readers would see the change and a sample that
+    no longer serializes to the same size is sent as zeros.
+    """
+    def __init__(self, publisher: 'cyclonedds.pub.Publisher', topic: 'cyclonedds.topic.Topic', qos=None, listener=None,
+                 defer_serialization: bool = False):
+        self._defer_serialization = defer_serialization
         cqos = _CQos.qos_to_cqos(qos) if qos else None
         super().__init__(
             self._create_writer(
@@ -115,13 +136,28 @@ class DataWriter(Entity):
 
     def write(self, sample, timestamp=None):
         if timestamp is not None:
-            ret = ddspy_write_ts(self._ref, sample, timestamp)
+            ret = ddspy_write_ts(self._ref, sample, timestamp, self._defer_serialization)
         else:
-            ret = ddspy_write(self._ref, sample)
+            ret = ddspy_write(self._ref, sample, self._defer_serialization)
 
         if ret < 0:
             raise DDSException(ret, f"Occurred while writing sample in {repr(self)}")
 
+    def write_many(self, samples, timestamps=None):
+        # All samples are written in one call, a sample that fails does not stop the others.
+        # The exception afterwards lists every sample that failed.
+        rets = ddspy_write_many(self._ref, samples, timestamps, self._defer_serialization)
+        failed = [i for i, ret in enumerate(rets) if ret < 0]
+        if failed:
+            raise DDSException(rets[failed[0]], f"Occurred while writing samples {failed} of {len(rets)} in {repr(self)}")
+
+    def write_serialized(self, data, timestamp=None):
+        # data is a serialized sample, including the encapsulation header, as returned by serialize.
+        # It is written as is, only the key is read from it.
+        ret = ddspy_write_serialized(self._ref, data, timestamp)
+        if ret < 0:
+            raise DDSException(ret, f"Occurred while writing serialized sample in {repr(self)}")
+
     def write_dispose(self, sample, timestamp=None):
         if timestamp is not None:
             ret = ddspy_writedispose_ts(self._ref, sample, timestamp)
@@ -10,10 +10,10 @@
  * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
 """
 
-from typing import List, Optional, Union, Generator, TYPE_CHECKING
+from typing import List, Optional, Tuple, Union, Generator, TYPE_CHECKING
 
 from .core import Entity, DDSException, WaitSet, ReadCondition, SampleState, InstanceState, ViewState
-from .internal import c_call, dds_c_t
+from .internal import c_call, dds_c_t, SampleInfo
 from .qos import _CQos
 from .util import duration
 
@@ -22,16 +22,34 @@ from .util import duration
 # But the import here allows your static type checker to resolve fully qualified cyclonedds names
 if TYPE_CHECKING:
     import cyclonedds
-    ddspy_read = lambda e, n: None
-    ddspy_take = lambda e, n: None
-    ddspy_read_handle = lambda e, n, h: None
-    ddspy_take_handle = lambda e, n, h: None
+
+    def ddspy_read(e, n, d=None, a=None):
+        return None
+
+    def ddspy_take(e, n, d=None, a=None):
+        return None
+
+    def ddspy_read_handle(e, n, h, d=None, a=None):
+        return None
+
+    def ddspy_take_handle(e, n, h, d=None, a=None):
+        return None
+
+    def ddspy_arena_new():
+        return None
+
     ddspy_lookup_instance = lambda e, s: None
     ddspy_read_next = lambda e: None
     ddspy_take_next = lambda e: None
+
+    def ddspy_read_raw(e, n):
+        return None
+
+    def ddspy_take_raw(e, n):
+        return None
 else:
     from ddspy import ddspy_read, ddspy_take, ddspy_read_handle, ddspy_take_handle, ddspy_lookup_instance, \
-        ddspy_read_next, ddspy_take_next
+        ddspy_read_next, ddspy_take_next, ddspy_read_raw, ddspy_take_raw, ddspy_arena_new
 
 
 class Subscriber(Entity):
@@ -77,6 +95,7 @@ class DataReader(Entity):
             topic: 'cyclonedds.topic.Topic',
             qos: Optional['cyclonedds.core.Qos'] = None,
             listener: Optional['cyclonedds.core.Listener'] = None):
+        self._topic = topic
         cqos = _CQos.qos_to_cqos(qos) if qos else None
         super().__init__(
             self._create_reader(
@@ -89,27 +108,61 @@ class DataReader(Entity):
         )
         if cqos:
             _CQos.cqos_destroy(cqos)
-
-    def read(self, N: int = 1, condition: Entity = None, instance_handle: int = None) -> List[object]:
+        # Sample and sample info memory for read and take, reused between calls
+        self._arena = ddspy_arena_new()
+
+    def read(self, N: int = 1, condition: Entity = None, instance_handle: int = None,
+             lazy: bool = False, fields: Optional[List[str]] = None) -> List[object]:
+        # Samples without data, like dispose and unregister notifications, are returned as an
+        # InvalidSample that only has the sample_info, with valid_data False. The same goes for take.
+        decoder = self._decoder(lazy, fields)
         if instance_handle is not None:
-            ret = ddspy_read_handle(condition._ref if condition else self._ref, N, instance_handle)
+            ret = ddspy_read_handle(condition._ref if condition else self._ref, N, instance_handle, decoder, self._arena)
         else:
-            ret = ddspy_read(condition._ref if condition else self._ref, N)
+            ret = ddspy_read(condition._ref if condition else self._ref, N, decoder, self._arena)
 
-        if type(ret) == int:
+        if isinstance(ret, int):
             raise DDSException(ret, f"Occurred while reading data in {repr(self)}")
         return ret
 
-    def take(self, N: int = 1, condition: Entity = None, instance_handle: int = None) -> List[object]:
+    def take(self, N: int = 1, condition: Entity = None, instance_handle: int = None,
+             lazy: bool = False, fields: Optional[List[str]] = None) -> List[object]:
+        decoder = self._decoder(lazy, fields)
         if instance_handle is not None:
-            ret = ddspy_take_handle(condition._ref if condition else self._ref, N, instance_handle)
+            ret = ddspy_take_handle(condition._ref if condition else self._ref, N, instance_handle, decoder, self._arena)
         else:
-            ret = ddspy_take(condition._ref if condition else self._ref, N)
+            ret = ddspy_take(condition._ref if condition else self._ref, N, decoder, self._arena)
 
-        if type(ret) == int:
+        if isinstance(ret, int):
             raise DDSException(ret, f"Occurred while taking data in {repr(self)}")
         return ret
 
+    def read_raw(self, N: int = 1, condition: Entity = None) -> List[Tuple[Optional[memoryview], SampleInfo]]:
+        # The serialized samples without deserializing them, as (data, sample_info) pairs. The
+        # memoryviews reference the memory of the samples without copying, data is None for
+        # samples without data, like disposes.
+        ret = ddspy_read_raw(condition._ref if condition else self._ref, N)
+        if isinstance(ret, int):
+            raise DDSException(ret, f"Occurred while reading raw data in {repr(self)}")
+        return ret
+
+    def take_raw(self, N: int = 1, condition: Entity = None) -> List[Tuple[Optional[memoryview], SampleInfo]]:
+        ret = ddspy_take_raw(condition._ref if condition else self._ref, N)
+        if isinstance(ret, int):
+            raise DDSException(ret, f"Occurred while taking raw data in {repr(self)}")
+        return ret
+
+    def _decoder(self, lazy, fields):
+        if fields is not None:
+            if lazy:
+                raise ValueError("A read can either be lazy or select fields, not both.")
+            return self._topic.data_type.cdr.projection(*fields).deserialize
+        return self._lazy_decode if lazy else None
+
+    def _lazy_decode(self, data):
+        # data references the received sample without a copy and keeps it alive as long as the lazy sample
+        return self._topic.data_type.cdr.deserialize(data, lazy=True)
+
     def read_next(self) -> Optional[object]:
         ret = ddspy_read_next(self._ref)
         
@@ -1 +1 @@
-from .message import Message, MessageAlt
+from .message import Message, MessageAlt, KeyedMessage
@@ -1,4 +1,5 @@
 from pycdr import cdr
+from pycdr.types import int8, int32
 
 
 @cdr
@@ -10,3 +11,11 @@ class Message:
 class MessageAlt:
     user_id: int
     message: str
+
+
+@cdr(keylist=["b", "c"])
+class KeyedMessage:
+    a: int8
+    b: int8
+    c: int32
+    message: str
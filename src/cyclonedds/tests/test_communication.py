@@ -1,8 +1,12 @@
 import pytest
 
-from cyclonedds.core import Entity, DDSStatus
+from cyclonedds.core import Entity, DDSStatus, ReadCondition, SampleState, ViewState, InstanceState
+from cyclonedds.topic import Topic
+from cyclonedds.pub import DataWriter
+from cyclonedds.sub import DataReader
+from cyclonedds.internal import InvalidSample
 
-from  testtopics import Message
+from  testtopics import Message, KeyedMessage
 
 
 def test_communication_basic_read(common_setup):
@@ -23,6 +27,77 @@ def test_communication_basic_take(common_setup):
     assert result[0] == msg
 
 
+def test_communication_lazy_take(common_setup):
+    msg = Message(message="Hi!")
+    common_setup.dw.write(msg)
+    result = common_setup.dr.take(lazy=True)
+
+    assert len(result) == 1
+    assert result[0].message == "Hi!"
+    assert result[0].materialize() == msg
+    assert result[0].sample_info.valid_data
+
+
+def test_communication_take_fields(common_setup):
+    msg = Message(message="Hi!")
+    common_setup.dw.write(msg)
+    result = common_setup.dr.take(fields=["message"])
+
+    assert len(result) == 1
+    assert result[0].message == "Hi!"
+    assert type(result[0]) is not Message
+
+
+def test_communication_take_raw(common_setup):
+    msg = Message(message="Hi!")
+    common_setup.dw.write(msg)
+    read = common_setup.dr.read_raw()
+    taken = common_setup.dr.take_raw()
+
+    assert len(read) == 1 and len(taken) == 1
+    data, info = taken[0]
+    assert info.valid_data
+    assert Message.deserialize(data) == msg
+    assert bytes(read[0][0]) == bytes(data)
+    assert common_setup.dr.take_raw() == []
+
+
+def test_communication_keyed_instances(manual_setup):
+    tp = Topic(manual_setup.dp, 'KeyedMessage', KeyedMessage)
+    dw = DataWriter(manual_setup.pub(), tp, qos=manual_setup.qos)
+    dr = DataReader(manual_setup.sub(), tp, qos=manual_setup.qos)
+    msg = KeyedMessage(a=1, b=3, c=0x01020304, message="Hi!")
+    same_key = KeyedMessage(a=2, b=3, c=0x01020304, message="Hi again!")
+
+    handle = dw.register_instance(msg)
+    assert dw.lookup_instance(msg) == handle
+    assert dw.lookup_instance(same_key) == handle
+
+    dw.write(msg)
+    result = dr.read()
+    assert len(result) == 1
+    assert result[0].sample_info.instance_handle == handle
+    assert dr.lookup_instance(msg) == handle
+
+    dw.dispose(same_key)
+    disposed = ReadCondition(dr, SampleState.Any | ViewState.Any | InstanceState.NotAliveDisposed)
+    result = dr.read(N=2, condition=disposed)
+    assert len(result) == 1
+    assert result[0] == msg
+    assert result[0].sample_info.instance_handle == handle
+
+
+def test_communication_take_dispose(common_setup):
+    common_setup.dw.write(common_setup.msg)
+    common_setup.dr.take()
+    common_setup.dw.dispose(common_setup.msg)
+    result = common_setup.dr.take()
+
+    assert len(result) == 1
+    assert type(result[0]) is InvalidSample
+    assert not result[0].sample_info.valid_data
+
+
 def test_communication_order(common_setup):
     msg1 = Message(message="Hi1!")
     msg2 = Message(message="Hi2!")
@@ -4,11 +4,18 @@ from cyclonedds.core import DDSException
 from cyclonedds.domain import DomainParticipant
 from cyclonedds.topic import Topic
 from cyclonedds.pub import Publisher, DataWriter
+from cyclonedds.sub import DataReader
 from cyclonedds.util import duration, isgoodentity
 
+from pycdr import cdr
 from  testtopics import Message
 
 
+@cdr
+class DeferredMessage:
+    message: str
+
+
 def test_initialize_writer():
     dp = DomainParticipant(0)
     tp = Topic(dp, "Message", Message)
@@ -32,6 +39,77 @@ def test_writeto_writer():
     assert dw.wait_for_acks(duration(seconds=1))
 
 
+def test_writer_defer_serialization(common_setup):
+    dw = DataWriter(common_setup.pub, common_setup.tp, qos=common_setup.qos, defer_serialization=True)
+    dw.write(common_setup.msg)
+    dw.write(common_setup.msg2, timestamp=10)
+
+    result = common_setup.dr.read(N=2)
+    assert result == [common_setup.msg, common_setup.msg2]
+    assert common_setup.dr.take(N=2, lazy=True)[0].message == common_setup.msg.message
+
+
+def test_writer_defer_serialization_local_only(common_setup, monkeypatch):
+    serialized = []
+    serialize_into = DeferredMessage.cdr.serialize_into
+
+    def counting_serialize_into(sample, data, endianness=None):
+        serialized.append(sample)
+        return serialize_into(sample, data, endianness)
+
+    # The topic picks up serialize_into when it is created
+    monkeypatch.setattr(DeferredMessage.cdr, "serialize_into", counting_serialize_into)
+    tp = Topic(common_setup.dp, "DeferredMessage", DeferredMessage)
+    dr = DataReader(common_setup.sub, tp, qos=common_setup.qos)
+    sample = DeferredMessage(message="local")
+
+    DataWriter(common_setup.pub, tp, qos=common_setup.qos, defer_serialization=True).write(sample)
+    assert dr.take() == [sample]
+    assert serialized == []
+
+    DataWriter(common_setup.pub, tp, qos=common_setup.qos).write(sample)
+    assert dr.take() == [sample]
+    assert serialized == [sample]
+
+
+def test_writer_defer_serialization_failure(common_setup):
+    dw = DataWriter(common_setup.pub, common_setup.tp, qos=common_setup.qos, defer_serialization=True)
+
+    # Samples are checked when they are written, not when they are sent
+    with pytest.raises(DDSException):
+        dw.write(Message(message=5))
+    with pytest.raises(DDSException):
+        dw.write_many([common_setup.msg, Message(message=None)])
+
+    assert common_setup.dr.read(N=2) == [common_setup.msg]
+
+
+def test_writer_write_many(common_setup):
+    messages = [Message(message=f"Hi{i}!") for i in range(5)]
+    common_setup.dw.write_many(messages)
+    common_setup.dw.write_many(iter(messages[:2]), timestamps=[10, 11])
+
+    assert common_setup.dr.read(N=7) == messages + messages[:2]
+
+    with pytest.raises(ValueError):
+        common_setup.dw.write_many(messages, timestamps=[10])
+
+    # A bad timestamp is found before anything is written
+    with pytest.raises(TypeError):
+        common_setup.dw.write_many(messages[:2], timestamps=[12, "13"])
+    assert len(common_setup.dr.read(N=10)) == 7
+
+
+def test_writer_write_serialized(common_setup):
+    common_setup.dw.write_serialized(common_setup.msg.serialize())
+    common_setup.dw.write_serialized(memoryview(common_setup.msg2.serialize()), timestamp=10)
+
+    assert common_setup.dr.read(N=2) == [common_setup.msg, common_setup.msg2]
+
+    with pytest.raises(ValueError):
+        common_setup.dw.write_serialized(b"")
+
+
 def test_writer_instance_handle(common_setup):
     handle = common_setup.dw.register_instance(common_setup.msg)
     assert handle > 0
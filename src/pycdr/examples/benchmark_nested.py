@@ -0,0 +1,64 @@
+"""
+ * Copyright(c) 2021 ADLINK Technology Limited and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+"""
+
+# Serialization time of a sequence of nested structs should grow linearly with
+# the number of elements: the time per element printed should stay flat.
+
+from timeit import Timer
+
+from pycdr import cdr
+from pycdr.machinery import Buffer
+from pycdr.types import int32, float64, sequence
+
+
+@cdr
+class Point:
+    x: float64
+    y: float64
+    label: str
+
+
+@cdr
+class Segment:
+    id: int32
+    start: Point
+    end: Point
+
+
+@cdr
+class Path:
+    segments: sequence[Segment]
+
+
+def make_path(n):
+    return Path(segments=[
+        Segment(id=i, start=Point(i, i, "start"), end=Point(i + 1, i + 1, "end"))
+        for i in range(n)
+    ])
+
+
+def per_element(function, n):
+    timer = Timer(function)
+    repeat, _ = timer.autorange()
+    return min(timer.repeat(3, repeat)) / repeat / n * 1e6
+
+
+print(f"{'elements':>10} {'serialize':>12} {'machine':>12} {'deserialize':>12}   [us/element]")
+for n in (10, 100, 1000, 10000, 50000):
+    path = make_path(n)
+    data = path.serialize()
+
+    def machine():
+        Path.cdr.machine.serialize(Buffer().seek(4), path)
+
+    print(f"{n:>10} {per_element(path.serialize, n):>12.3f} {per_element(machine, n):>12.3f} "
+          f"{per_element(lambda: Path.deserialize(data), n):>12.3f}")
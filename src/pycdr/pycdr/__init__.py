@@ -15,10 +15,11 @@ from dataclasses import dataclass
 from .main import CDR, proto_deserialize, proto_serialize, Endianness
 
 
-def cdr(*args, final=True, mutable=False, appendable=False, keylist=None):
+def cdr(*args, final=True, mutable=False, appendable=False, keylist=None, numpy=False, bypass_init=False):
     def in_cdr(cls):
         cls = dataclass(cls)
-        cls.cdr = CDR(cls, final=final, mutable=mutable, appendable=appendable, keylist=keylist)
+        cls.cdr = CDR(cls, final=final, mutable=mutable, appendable=appendable, keylist=keylist, numpy=numpy,
+                      bypass_init=bypass_init)
         cls.serialize = proto_serialize
         cls.deserialize = classmethod(proto_deserialize)
 
@@ -0,0 +1,286 @@
+"""
+ * Copyright(c) 2021 ADLINK Technology Limited and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+"""
+
+import struct
+import warnings
+from collections import Counter
+from contextlib import contextmanager
+from itertools import count
+
+
+# What invalid values or malformed data make generated code raise. The machine then redoes the work
+# to raise the error it always has, anything else is not caught.
+expected_errors = (struct.error, TypeError, ValueError, AttributeError, IndexError, KeyError, OverflowError)
+
+# Generated functions that failed where their machine did not, which is a bug in the generated code.
+# Counted by function and type; with strict set (the tests do) it raises instead.
+recoveries = Counter()
+strict = False
+
+
+def recovered(name, owner, error):
+    recoveries[(name, owner)] += 1
+    if strict:
+        raise RuntimeError(f"Generated {name} of {owner} failed where the machine did not.") from error
+    if recoveries[(name, owner)] == 1:
+        warnings.warn(f"Generated {name} of {owner} failed where the machine did not: {error!r}", RuntimeWarning)
+
+
+def utf8_length(string):
+    return len(string) if string.isascii() else len(string.encode('utf-8'))
+
+
+if not hasattr(str, 'isascii'):
+    # Python 3.6
+    def utf8_length(string):  # noqa F811
+        return len(string.encode('utf-8'))
+
+
+class CodeGenerator:
+    """Collects the source of one generated function.
+
+    Machines emit their code through this object. The generated code keeps the
+    position in the buffer in the local variable `pos` and the backing storage
+    of the buffer in the local variable `data`. While emitting, the generator
+    tracks what is statically known about the alignment: `pos - 4` is congruent
+    to `phase` modulo `modulus`.
+    """
+    # Nested types are inlined up to this depth, deeper ones are called
+    max_inline_depth = 8
+
+    def __init__(self, endian):
+        self.endian = endian
+        self.namespace = {
+            'struct': struct, 'utf8_length': utf8_length, '_expected': expected_errors, '_recovered': recovered
+        }
+        self.lines = []
+        self.depth = 2
+        self.phase = 0
+        self.modulus = 1
+        self._counter = count()
+        self._bound = {}
+        self._inlined = []
+
+    def variable(self, prefix='v'):
+        return f"{prefix}{next(self._counter)}"
+
+    def bind(self, obj, prefix='g'):
+        # Objects are bound by identity, they stay alive in the namespace.
+        key = ('obj', id(obj))
+        if key not in self._bound:
+            name = self.variable('_' + prefix)
+            self.namespace[name] = obj
+            self._bound[key] = name
+        return self._bound[key]
+
+    def can_inline(self, type):
+        # Recursive types are only expanded once, after that they call their own function
+        return type not in self._inlined and len(self._inlined) < self.max_inline_depth
+
+    @contextmanager
+    def inline(self, type):
+        self._inlined.append(type)
+        yield
+        self._inlined.pop()
+
+    def _struct(self, method, fmt):
+        key = (method, fmt)
+        if key not in self._bound:
+            name = self.variable('_' + method[:-5])
+            self.namespace[name] = getattr(struct.Struct(self.endian + fmt), method)
+            self._bound[key] = name
+        return self._bound[key]
+
+    def _run_variants(self, members):
+        # One precompiled struct per possible starting phase of the run, the
+        # padding between the members is different for every phase.
+        alignment = max(a for a, _ in members)
+        variants = [None] * alignment
+        for phase in range(alignment):
+            if self.modulus < alignment and phase % self.modulus != self.phase:
+                continue
+            if self.modulus >= alignment and phase != self.phase % alignment:
+                continue
+            offset, fmt = phase, self.endian
+            for a, code in members:
+                padding = -offset & (a - 1)
+                fmt += 'x' * padding + code
+                offset += padding + a
+            variants[phase] = struct.Struct(fmt)
+        return alignment, variants
+
+    def packer(self, fmt):
+        return self._struct('pack_into', fmt)
+
+    def unpacker(self, fmt):
+        return self._struct('unpack_from', fmt)
+
+    def emit(self, line):
+        self.lines.append('    ' * self.depth + line)
+
+    @contextmanager
+    def block(self, header):
+        self.emit(header)
+        self.depth += 1
+        length = len(self.lines)
+        yield
+        if len(self.lines) == length:
+            self.emit("pass")
+        self.depth -= 1
+
+    @contextmanager
+    def loop(self, header):
+        # Every iteration can start at a different alignment phase
+        self.forget()
+        with self.block(header):
+            yield
+            self.forget()
+        self.forget()
+
+    def forget(self):
+        self.phase, self.modulus = 0, 1
+
+    def advance(self, size):
+        self.emit(f"pos += {size}")
+        self.phase = (self.phase + size) % self.modulus
+
+    def align(self, alignment):
+        if alignment <= 1:
+            return
+        if self.modulus >= alignment:
+            padding = -self.phase & (alignment - 1)
+            if padding:
+                self.advance(padding)
+            return
+        self.emit(f"pos += (4 - pos) & {alignment - 1}")
+        self.phase, self.modulus = 0, alignment
+
+    def _run(self, members):
+        alignment, variants = self._run_variants(members)
+        known = [v for v in variants if v is not None]
+        run = self.variable('r')
+        if len(known) == 1:
+            self.emit(f"{run} = {self.bind(known[0], 'run')}")
+        else:
+            self.emit(f"{run} = {self.bind(tuple(variants), 'runs')}[(pos - 4) & {alignment - 1}]")
+
+        ends = {(i + v.size) % alignment for i, v in enumerate(variants) if v is not None}
+        return run, max(v.size for v in known), alignment, ends
+
+    def _run_done(self, run, alignment, ends):
+        self.emit(f"pos += {run}.size")
+        if len(ends) == 1:
+            self.phase, self.modulus = ends.pop(), alignment
+        else:
+            self.forget()
+
+    def pack_run(self, members, values):
+        """Write consecutive primitives (alignment, struct code) in one struct call."""
+        run, size, alignment, ends = self._run(members)
+        self.reserve(size)
+        self.emit(f"{run}.pack_into(data, pos, {', '.join(values)})")
+        self._run_done(run, alignment, ends)
+
+    def skip_run(self, members):
+        run, _, alignment, ends = self._run(members)
+        self._run_done(run, alignment, ends)
+
+    def unpack_run(self, members):
+        # Members with a pad code ('4x') are skipped and get no variable
+        run, _, alignment, ends = self._run(members)
+        values = [self.variable() for _, code in members if not code.endswith('x')]
+        self.emit(f"{', '.join(values)}, = {run}.unpack_from(data, pos)")
+        self._run_done(run, alignment, ends)
+        return values
+
+    def reserve(self, size):
+        with self.block(f"if pos + {size} > buffer._size:"):
+            self.emit("buffer._pos = pos")
+            self.emit(f"buffer.ensure_size({size})")
+            self.emit("data = buffer._bytes")
+
+    def sync_out(self):
+        self.emit("buffer._pos = pos")
+
+    def sync_in(self):
+        self.emit("pos = buffer._pos")
+        self.emit("data = buffer._bytes")
+        self.forget()
+
+    def function(self, name, owner, args, prologue, epilogue, reset, fallback):
+        # An expected failure in the generated code is handed to the original machine, the
+        # fallback expression, which redoes the work from the start and raises the same errors
+        # it always has. If it succeeds instead the generated code is wrong, which is reported.
+        source = [f"def {name}({args}):"]
+        source += ['    ' + line for line in prologue]
+        source += ['    try:'] + (self.lines or ['        pass'])
+        source += ['    except _expected as error:'] + ['        ' + line for line in reset]
+        source += [f'        result = {fallback}']
+        source += [f'        _recovered({name!r}, {owner!r}, error)', '        return result']
+        source += ['    ' + line for line in epilogue]
+        source = '\n'.join(source) + '\n'
+
+        exec(compile(source, f"<pycdr {name}>", "exec"), self.namespace)
+        function = self.namespace[name]
+        function.source = source
+        return function
+
+
+def describe(machine):
+    # Name of what a machine encodes, for reports about its generated code
+    return getattr(getattr(machine, 'type', None), '__qualname__', type(machine).__name__)
+
+
+class CompiledMachine:
+    """The generated serialize, deserialize and size functions of one machine for one endianness."""
+    def __init__(self, machine, endian):
+        self.machine = machine
+        self.endian = endian
+        self.owner = describe(machine)
+        self.serialize = self._compile_serialize()
+        self.deserialize = self._compile_deserialize()
+        self.serialized_size = self._compile_serialized_size()
+
+    def _compile_serialize(self):
+        gen = CodeGenerator(self.endian)
+        machine = gen.bind(self.machine, 'machine')
+        self.machine.compile_serialize(gen, 'value')
+        return gen.function(
+            'serialize', self.owner, 'buffer, value',
+            ['start = pos = buffer._pos', 'data = buffer._bytes'],
+            ['buffer._pos = pos'],
+            ['buffer._pos = start'], f'{machine}.serialize(buffer, value)'
+        )
+
+    def _compile_deserialize(self):
+        gen = CodeGenerator(self.endian)
+        machine = gen.bind(self.machine, 'machine')
+        result = self.machine.compile_deserialize(gen)
+        gen.emit(f"result = {result}")
+        return gen.function(
+            'deserialize', self.owner, 'buffer',
+            ['start = pos = buffer._pos', 'data = buffer._bytes'],
+            ['buffer._pos = pos', 'return result'],
+            ['buffer._pos = start'], f'{machine}.deserialize(buffer)'
+        )
+
+    def _compile_serialized_size(self):
+        # Returns the position after writing value at pos
+        gen = CodeGenerator(self.endian)
+        machine = gen.bind(self.machine, 'machine')
+        self.machine.compile_size(gen, 'value')
+        return gen.function(
+            'serialized_size', self.owner, 'value, pos',
+            ['start = pos'],
+            ['return pos'],
+            [], f'{machine}.measure(value, start)'
+        )
@@ -0,0 +1,111 @@
+"""
+ * Copyright(c) 2021 ADLINK Technology Limited and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+"""
+
+from .codegen import CodeGenerator, CompiledMachine, describe
+from .machinery import Buffer
+
+
+class LazyLayout:
+    """Finds where the members of a struct start in its serialized data, for one endianness.
+
+    The offsets come from one pass that skips over every member without decoding it,
+    members are decoded separately when they are asked for.
+    """
+    def __init__(self, machine, endianness, endian):
+        self.machine = machine
+        self.endianness = endianness
+        self.endian = endian
+        self.members = list(machine.members_machines)
+        self.index = {member: i for i, member in enumerate(self.members)}
+        self.offsets = self._compile_offsets()
+        self._decoders = [None] * len(self.members)
+
+    def _compile_offsets(self):
+        gen = CodeGenerator(self.endian)
+        layout = gen.bind(self, 'layout')
+        offsets = []
+        for machine in self.machine.members_machines.values():
+            offsets.append(gen.variable('o'))
+            gen.emit(f"{offsets[-1]} = pos")
+            machine.compile_skip(gen)
+        with gen.block("if pos > len(data):"):
+            gen.emit('raise IndexError("Sample extends beyond the end of the buffer.")')
+        gen.emit(f"result = ({''.join(o + ', ' for o in offsets)})")
+        return gen.function(
+            'offsets', describe(self.machine), 'buffer',
+            ['start = pos = buffer._pos', 'data = buffer._bytes'],
+            ['buffer._pos = pos', 'return result'],
+            ['buffer._pos = start'], f'{layout}.scan(buffer)'
+        )
+
+    def scan(self, buffer):
+        offsets = []
+        for machine in self.machine.members_machines.values():
+            offsets.append(buffer.tell())
+            machine.skip(buffer)
+        if buffer.tell() > len(buffer._bytes):
+            raise IndexError("Sample extends beyond the end of the buffer.")
+        return tuple(offsets)
+
+    def decode(self, index, data, offset, views):
+        decoder = self._decoders[index]
+        if decoder is None:
+            machine = self.machine.members_machines[self.members[index]]
+            decoder = self._decoders[index] = CompiledMachine(machine, self.endian).deserialize
+        buffer = Buffer(data, views=views).seek(offset)
+        buffer.set_endianness(self.endianness)
+        return decoder(buffer)
+
+    def sample(self, buffer):
+        return LazySample(self, buffer._bytes, self.offsets(buffer), buffer.views)
+
+
+class LazySample:
+    """A deserialized sample that decodes each member when it is first accessed.
+
+    Decoded members are cached on the proxy, assigning to a member replaces it. The
+    serialized data is referenced, not copied, so it must not change while the proxy
+    is in use. Call `materialize` to get an instance of the real class.
+    """
+    def __init__(self, layout, data, offsets, views=False):
+        self._lazy_layout = layout
+        self._lazy_data = data
+        self._lazy_offsets = offsets
+        self._lazy_views = views
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not in the instance dict yet
+        if name.startswith('_lazy_'):
+            raise AttributeError(name)
+        layout = self._lazy_layout
+        index = layout.index.get(name)
+        if index is None:
+            raise AttributeError(f"'{layout.machine.type.__name__}' object has no attribute '{name}'")
+        value = self.__dict__[name] = layout.decode(index, self._lazy_data, self._lazy_offsets[index], self._lazy_views)
+        return value
+
+    def materialize(self):
+        layout = self._lazy_layout
+        value = layout.machine.construct({member: getattr(self, member) for member in layout.members})
+        # Attributes set on the proxy that are not members, like the sample_info of a reader
+        for name, attribute in self.__dict__.items():
+            if name not in layout.index and not name.startswith('_lazy_'):
+                object.__setattr__(value, name, attribute)
+        return value
+
+    def __eq__(self, other):
+        if isinstance(other, LazySample):
+            other = other.materialize()
+        return self.materialize() == other
+
+    def __repr__(self):
+        return f"lazy {self.materialize()!r}"
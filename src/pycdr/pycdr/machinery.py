@@ -15,8 +15,14 @@ from enum import Enum, auto
 from typing import Union
 import struct
 import sys
+import threading
 from inspect import isclass
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from .types import ArrayHolder, BoundStringHolder, SequenceHolder, default, primitive_types, IdlUnion, NoneType
 from .type_helper import Annotated, get_origin, get_args, get_type_hints
 
@@ -30,20 +36,43 @@ class Endianness(Enum):
         return Endianness.Little if sys.byteorder == "little" else Endianness.Big
 
 
+class StructCache(dict):
+    """Precompiled structs for one byte order, by format."""
+    def __init__(self, endian):
+        super().__init__()
+        self.endian = endian
+
+    def __missing__(self, fmt):
+        compiled = self[fmt] = struct.Struct(self.endian + fmt)
+        return compiled
+
+
+# The native byte order is always '=', which never swaps
+structs = {endian: StructCache(endian) for endian in '<>='}
+endian_codes = {Endianness.Little: '<', Endianness.Big: '>', Endianness.native(): '='}
+
+
 class Buffer:
-    def __init__(self, bytes=None):
-        self._bytes = bytearray(bytes) if bytes else bytearray(512)
+    """Growable write buffer, or a read buffer over any bytes-like object.
+
+    Data passed in is wrapped without copying. With `views` set, bytes members and
+    numpy arrays read from the buffer are memoryview slices / ndarray views of that
+    data instead of copies; they keep the data alive, but if the memory is not owned
+    by a python object (e.g. a memoryview from C) they must not escape its lifetime.
+    """
+    def __init__(self, bytes=None, views=False):
+        self._bytes = memoryview(bytes).cast('B') if bytes is not None else bytearray(512)
         self._pos = 0
         self._size = len(self._bytes)
         self._endian = '='
+        self._structs = structs['=']
         self.endianness = Endianness.native()
+        self.views = views
 
     def set_endianness(self, endianness):
         self.endianness = endianness
-        if self.endianness == Endianness.Little:
-            self._endian = "<"
-        else:
-            self._endian = ">"
+        self._endian = endian_codes[endianness]
+        self._structs = structs[self._endian]
 
     def seek(self, pos):
         self._pos = pos
@@ -56,9 +85,10 @@ class Buffer:
         if self._pos + size > self._size:
             old_bytes = self._bytes
             old_size = self._size
-            self._size *= 2
+            self._size = max(self._size * 2, self._pos + size)
             self._bytes = bytearray(self._size)
             self._bytes[0:old_size] = old_bytes
+        return self
 
     def align(self, alignment):
         self._pos = ((self._pos - 4 + alignment - 1) & ~(alignment - 1)) + 4
@@ -66,7 +96,7 @@ class Buffer:
 
     def write(self, pack, size, value):
         self.ensure_size(size)
-        struct.pack_into(self._endian + pack, self._bytes, self._pos, value)
+        self._structs[pack].pack_into(self._bytes, self._pos, value)
         self._pos += size
         return self
 
@@ -78,12 +108,12 @@ class Buffer:
         return self
 
     def read_bytes(self, length):
-        b = bytes(self._bytes[self._pos:self._pos+length])
+        b = self._bytes[self._pos:self._pos+length]
         self._pos += length
-        return b
+        return b if self.views else bytes(b)
 
     def read(self, pack, size):
-        v = struct.unpack_from(self._endian + pack, buffer=self._bytes, offset=self._pos)
+        v = self._structs[pack].unpack_from(self._bytes, self._pos)
         self._pos += size
         return v[0]
 
@@ -91,6 +121,79 @@ class Buffer:
         return bytes(self._bytes[0:self._pos])
 
 
+class BufferPool:
+    """Free write buffers of one thread, in power of two size classes.
+
+    A buffer belongs to one serialization from acquire to release, so nested calls
+    (like computing a key while serializing) and other threads never share it.
+    Samples larger than `max_size` get a buffer that is not kept, and size classes
+    that were not used during the last `shrink_interval` acquires are dropped.
+    Buffers are zeroed when they are released, alignment padding that is skipped
+    over never holds bytes of an earlier sample.
+    """
+    min_size = 512
+    max_size = 65536
+    per_class = 4
+    shrink_interval = 1024
+
+    def __init__(self):
+        self._free = {}
+        self._used = set()
+        self._acquired = 0
+
+    def acquire(self, size, endianness=None):
+        self._acquired += 1
+        if self._acquired >= self.shrink_interval:
+            self.shrink()
+
+        if size > self.max_size:
+            data = bytearray(size)
+        else:
+            size_class = max(self.min_size, 1 << (size - 1).bit_length())
+            self._used.add(size_class)
+            free = self._free.get(size_class)
+            data = free.pop() if free else bytearray(size_class)
+
+        buffer = Buffer(data)
+        if endianness is not None:
+            buffer.set_endianness(endianness)
+        return buffer
+
+    def release(self, buffer):
+        data = buffer._bytes
+        if isinstance(data, memoryview):
+            data = data.obj
+        size = len(data)
+        # Buffers that grew past their class are only kept if they fit another one
+        if size > self.max_size or size < self.min_size or size & (size - 1):
+            return
+        free = self._free.setdefault(size, [])
+        if len(free) < self.per_class:
+            # A failed serialization can write past the position, so all of it is cleared
+            data[:] = _zeros[:size]
+            free.append(data)
+
+    def shrink(self):
+        for size_class in list(self._free):
+            if size_class not in self._used:
+                del self._free[size_class]
+        self._used.clear()
+        self._acquired = 0
+
+
+_zeros = memoryview(bytes(BufferPool.max_size))
+_local = threading.local()
+
+
+def buffer_pool() -> BufferPool:
+    """The buffer pool of the calling thread."""
+    try:
+        return _local.pool
+    except AttributeError:
+        pool = _local.pool = BufferPool()
+        return pool
+
+
 class MaxSizeFinder:
     def __init__(self):
         self.size = 0
@@ -117,6 +220,42 @@ class Machine:
     def max_size(self, finder):
         pass
 
+    def fixed_size(self):
+        return False
+
+    def skip(self, buffer):
+        # Move past the value, machines that can do it without decoding override this
+        self.deserialize(buffer)
+
+    def measure(self, value, pos):
+        # Serialize to a scratch buffer at the same alignment to find the size
+        buffer = Buffer().seek(4 + (pos - 4) % 8)
+        start = buffer.tell()
+        self.serialize(buffer, value)
+        return pos + buffer.tell() - start
+
+    def compile_size(self, gen, value):
+        gen.emit(f"pos = {gen.bind(self, 'machine')}.measure({value}, pos)")
+        gen.forget()
+
+    def compile_serialize(self, gen, value):
+        # Machines without generated code are called as they are
+        machine = gen.bind(self, 'machine')
+        gen.sync_out()
+        gen.emit(f"{machine}.serialize(buffer, {value})")
+        gen.sync_in()
+
+    def compile_deserialize(self, gen):
+        machine = gen.bind(self, 'machine')
+        var = gen.variable()
+        gen.sync_out()
+        gen.emit(f"{var} = {machine}.deserialize(buffer)")
+        gen.sync_in()
+        return var
+
+    def compile_skip(self, gen):
+        self.compile_deserialize(gen)
+
 
 class NoneMachine(Machine):
     def __init__(self):
@@ -131,23 +270,73 @@ class NoneMachine(Machine):
     def max_size(self, finder):
         pass
 
+    def fixed_size(self):
+        return True
+
+    def compile_size(self, gen, value):
+        pass
+
+    def compile_serialize(self, gen, value):
+        pass
+
+    def compile_deserialize(self, gen):
+        return "None"
+
+    def skip(self, buffer):
+        pass
+
+    def compile_skip(self, gen):
+        pass
+
 
 class PrimitiveMachine(Machine):
     def __init__(self, type):
         self.type = type
         self.alignment, self.code = primitive_types[self.type]
+        self.structs = {endian: structs[endian][self.code] for endian in '<>='}
 
     def serialize(self, buffer, value):
         buffer.align(self.alignment)
-        buffer.write(self.code, self.alignment, value)
+        buffer.ensure_size(self.alignment)
+        self.structs[buffer._endian].pack_into(buffer._bytes, buffer._pos, value)
+        buffer._pos += self.alignment
 
     def deserialize(self, buffer):
         buffer.align(self.alignment)
-        return buffer.read(self.code, self.alignment)
+        value, = self.structs[buffer._endian].unpack_from(buffer._bytes, buffer._pos)
+        buffer._pos += self.alignment
+        return value
 
     def max_size(self, finder: MaxSizeFinder):
         finder.increase(self.alignment, self.alignment)
 
+    def fixed_size(self):
+        return True
+
+    def compile_size(self, gen, value):
+        gen.align(self.alignment)
+        gen.advance(self.alignment)
+
+    def compile_serialize(self, gen, value):
+        gen.align(self.alignment)
+        gen.reserve(self.alignment)
+        gen.emit(f"{gen.packer(self.code)}(data, pos, {value})")
+        gen.advance(self.alignment)
+
+    def compile_deserialize(self, gen):
+        var = gen.variable()
+        gen.align(self.alignment)
+        gen.emit(f"{var} = {gen.unpacker(self.code)}(data, pos)[0]")
+        gen.advance(self.alignment)
+        return var
+
+    def skip(self, buffer):
+        buffer.align(self.alignment)
+        buffer._pos += self.alignment
+
+    def compile_skip(self, gen):
+        self.compile_size(gen, None)
+
 
 class StringMachine(Machine):
     def __init__(self, bound=None):
@@ -168,7 +357,7 @@ class StringMachine(Machine):
         numbytes = buffer.read('I', 4)
         bytes = buffer.read_bytes(numbytes - 1)
         buffer.read('b', 1)
-        return bytes.decode('utf-8')
+        return str(bytes, 'utf-8')
 
     def max_size(self, finder: MaxSizeFinder):
         if self.bound:
@@ -176,6 +365,48 @@ class StringMachine(Machine):
         else:
             finder.increase(2**64 - 1 + 5, 2)
 
+    def compile_size(self, gen, value):
+        gen.align(4)
+        gen.emit(f"pos += utf8_length({value}) + 5")
+        gen.forget()
+
+    def compile_serialize(self, gen, value):
+        string, encoded, length = gen.variable('s'), gen.variable('b'), gen.variable('n')
+        gen.emit(f"{string} = {value}")
+        if self.bound:
+            with gen.block(f"if len({string}) > {self.bound}:"):
+                gen.emit('raise ValueError("String longer than bound.")')
+        gen.emit(f"{encoded} = {string}.encode('utf-8')")
+        gen.emit(f"{length} = len({encoded})")
+        gen.align(4)
+        gen.reserve(f"{length} + 5")
+        gen.emit(f"{gen.packer('I')}(data, pos, {length} + 1)")
+        gen.emit(f"data[pos + 4:pos + 4 + {length}] = {encoded}")
+        gen.emit(f"data[pos + 4 + {length}] = 0")
+        gen.emit(f"pos += {length} + 5")
+        gen.forget()
+
+    def compile_deserialize(self, gen):
+        var, length = gen.variable(), gen.variable('n')
+        gen.align(4)
+        gen.emit(f"{length} = {gen.unpacker('I')}(data, pos)[0] + pos + 4")
+        with gen.block(f"if {length} > len(data):"):
+            gen.emit('raise IndexError("String extends beyond the end of the buffer.")')
+        gen.emit(f"{var} = str(data[pos + 4:{length} - 1], 'utf-8')")
+        gen.emit(f"pos = {length}")
+        gen.forget()
+        return var
+
+    def skip(self, buffer):
+        buffer.align(4)
+        num = buffer.read('I', 4)
+        buffer._pos += num
+
+    def compile_skip(self, gen):
+        gen.align(4)
+        gen.emit(f"pos += {gen.unpacker('I')}(data, pos)[0] + 4")
+        gen.forget()
+
 
 class BytesMachine(Machine):
     def __init__(self, bound=None):
@@ -200,6 +431,46 @@ class BytesMachine(Machine):
         else:
             finder.increase(65535 + 3, 2)
 
+    def compile_size(self, gen, value):
+        gen.align(2)
+        gen.emit(f"pos += len({value}) + 2")
+        gen.forget()
+
+    def compile_serialize(self, gen, value):
+        encoded, length = gen.variable('b'), gen.variable('n')
+        gen.emit(f"{encoded} = {value}")
+        gen.emit(f"{length} = len({encoded})")
+        if self.bound:
+            with gen.block(f"if {length} > {self.bound}:"):
+                gen.emit('raise ValueError("Bytes longer than bound.")')
+        gen.align(2)
+        gen.reserve(f"{length} + 2")
+        gen.emit(f"{gen.packer('H')}(data, pos, {length})")
+        gen.emit(f"data[pos + 2:pos + 2 + {length}] = {encoded}")
+        gen.emit(f"pos += {length} + 2")
+        gen.forget()
+
+    def compile_deserialize(self, gen):
+        var, length = gen.variable(), gen.variable('n')
+        gen.align(2)
+        gen.emit(f"{length} = {gen.unpacker('H')}(data, pos)[0]")
+        gen.emit(f"{var} = data[pos + 2:pos + 2 + {length}]")
+        with gen.block("if not buffer.views:"):
+            gen.emit(f"{var} = bytes({var})")
+        gen.emit(f"pos += {length} + 2")
+        gen.forget()
+        return var
+
+    def skip(self, buffer):
+        buffer.align(2)
+        num = buffer.read('H', 2)
+        buffer._pos += num
+
+    def compile_skip(self, gen):
+        gen.align(2)
+        gen.emit(f"pos += {gen.unpacker('H')}(data, pos)[0] + 2")
+        gen.forget()
+
 
 class ByteArrayMachine(Machine):
     def __init__(self, size):
@@ -247,6 +518,65 @@ class ArrayMachine(Machine):
         size = (size + self.alignment - 1) & ~(self.alignment - 1)
         finder.size = pre_size + self.size * size
 
+    def fixed_size(self):
+        return self.submachine.fixed_size()
+
+    def compile_size(self, gen, value):
+        if type(self.submachine) is PrimitiveMachine or self.size == 0:
+            if self.size:
+                gen.align(self.alignment)
+                gen.advance(self.size * self.alignment)
+            return
+        element = gen.variable('e')
+        if self.submachine.fixed_size():
+            with gen.loop(f"for _ in range({self.size}):"):
+                self.submachine.compile_size(gen, None)
+            return
+        with gen.loop(f"for {element} in {value}:"):
+            self.submachine.compile_size(gen, element)
+
+    def compile_serialize(self, gen, value):
+        array, element = gen.variable('a'), gen.variable('e')
+        gen.emit(f"{array} = {value}")
+        gen.emit(f"assert len({array}) == {self.size}")
+        if type(self.submachine) is PrimitiveMachine and self.size:
+            # Primitive elements are never padded, the whole array is one struct
+            gen.align(self.alignment)
+            gen.reserve(self.size * self.alignment)
+            gen.emit(f"{gen.packer(str(self.size) + self.submachine.code)}(data, pos, *{array})")
+            gen.advance(self.size * self.alignment)
+            return
+        with gen.loop(f"for {element} in {array}:"):
+            self.submachine.compile_serialize(gen, element)
+
+    def compile_deserialize(self, gen):
+        var = gen.variable()
+        if type(self.submachine) is PrimitiveMachine and self.size:
+            gen.align(self.alignment)
+            gen.emit(f"{var} = list({gen.unpacker(str(self.size) + self.submachine.code)}(data, pos))")
+            gen.advance(self.size * self.alignment)
+            return var
+        gen.emit(f"{var} = []")
+        with gen.loop(f"for _ in range({self.size}):"):
+            gen.emit(f"{var}.append({self.submachine.compile_deserialize(gen)})")
+        return var
+
+    def skip(self, buffer):
+        if type(self.submachine) is PrimitiveMachine:
+            if self.size:
+                buffer.align(self.alignment)
+                buffer._pos += self.size * self.alignment
+            return
+        for i in range(self.size):
+            self.submachine.skip(buffer)
+
+    def compile_skip(self, gen):
+        if type(self.submachine) is PrimitiveMachine or self.size == 0:
+            self.compile_size(gen, None)
+            return
+        with gen.loop(f"for _ in range({self.size}):"):
+            self.submachine.compile_skip(gen)
+
 
 class SequenceMachine(Machine):
     def __init__(self, submachine, maxlen=None):
@@ -282,6 +612,151 @@ class SequenceMachine(Machine):
         size = (size + self.alignment - 1) & ~(self.alignment - 1)
         finder.size = pre_size + (self.maxlen if self.maxlen else 65535) * size + 2
 
+    def compile_size(self, gen, value):
+        gen.align(2)
+        gen.advance(2)
+        if type(self.submachine) is PrimitiveMachine:
+            size, length = self.submachine.alignment, gen.variable('n')
+            gen.emit(f"{length} = len({value})")
+            with gen.block(f"if {length}:"):
+                gen.align(size)
+                gen.emit(f"pos += {length} * {size}")
+            gen.forget()
+            return
+        element = gen.variable('e')
+        with gen.loop(f"for {element} in {value}:"):
+            self.submachine.compile_size(gen, element)
+
+    def compile_serialize(self, gen, value):
+        sequence, element = gen.variable('a'), gen.variable('e')
+        gen.emit(f"{sequence} = {value}")
+        if self.maxlen is not None:
+            gen.emit(f"assert len({sequence}) <= {self.maxlen}")
+        gen.align(2)
+        gen.reserve(2)
+        gen.emit(f"{gen.packer('H')}(data, pos, len({sequence}))")
+        gen.advance(2)
+        if type(self.submachine) is PrimitiveMachine:
+            code, size = self.submachine.code, self.submachine.alignment
+            with gen.block(f"if {sequence}:"):
+                gen.align(size)
+                gen.reserve(f"len({sequence}) * {size}")
+                gen.emit(f"struct.pack_into('{gen.endian}%d{code}' % len({sequence}), data, pos, *{sequence})")
+                gen.emit(f"pos += len({sequence}) * {size}")
+            gen.forget()
+            return
+        with gen.loop(f"for {element} in {sequence}:"):
+            self.submachine.compile_serialize(gen, element)
+
+    def compile_deserialize(self, gen):
+        var, length = gen.variable(), gen.variable('n')
+        gen.align(2)
+        gen.emit(f"{length} = {gen.unpacker('H')}(data, pos)[0]")
+        gen.advance(2)
+        if type(self.submachine) is PrimitiveMachine:
+            code, size = self.submachine.code, self.submachine.alignment
+            gen.emit(f"{var} = []")
+            with gen.block(f"if {length}:"):
+                gen.align(size)
+                gen.emit(f"{var} = list(struct.unpack_from('{gen.endian}%d{code}' % {length}, data, pos))")
+                gen.emit(f"pos += {length} * {size}")
+            gen.forget()
+            return var
+        gen.emit(f"{var} = []")
+        with gen.loop(f"for _ in range({length}):"):
+            gen.emit(f"{var}.append({self.submachine.compile_deserialize(gen)})")
+        return var
+
+    def skip(self, buffer):
+        buffer.align(2)
+        num = buffer.read('H', 2)
+        if type(self.submachine) is PrimitiveMachine:
+            if num:
+                buffer.align(self.submachine.alignment)
+                buffer._pos += num * self.submachine.alignment
+            return
+        for i in range(num):
+            self.submachine.skip(buffer)
+
+    def compile_skip(self, gen):
+        length = gen.variable('n')
+        gen.align(2)
+        gen.emit(f"{length} = {gen.unpacker('H')}(data, pos)[0]")
+        gen.advance(2)
+        if type(self.submachine) is PrimitiveMachine:
+            size = self.submachine.alignment
+            with gen.block(f"if {length}:"):
+                gen.align(size)
+                gen.emit(f"pos += {length} * {size}")
+            gen.forget()
+            return
+        with gen.loop(f"for _ in range({length}):"):
+            self.submachine.compile_skip(gen)
+
+
+class NumpyArrayMachine(ArrayMachine):
+    """Array of primitives as a numpy ndarray, (de)serialized as one block of memory."""
+    def __init__(self, submachine, size):
+        super().__init__(submachine, size)
+        self.dtypes = {e: np.dtype(e + submachine.code) for e in '<>='}
+
+    def serialize(self, buffer, value):
+        array = np.ascontiguousarray(value, dtype=self.dtypes[buffer._endian])
+        assert len(array) == self.size
+
+        if self.size:
+            buffer.align(self.alignment)
+            buffer.write_bytes(memoryview(array).cast('B'))
+
+    def deserialize(self, buffer):
+        if self.size:
+            buffer.align(self.alignment)
+        return _read_ndarray(buffer, self.dtypes[buffer._endian], self.size)
+
+    def fixed_size(self):
+        return True
+
+    compile_serialize = Machine.compile_serialize
+    compile_deserialize = Machine.compile_deserialize
+
+
+class NumpySequenceMachine(SequenceMachine):
+    """Sequence of primitives as a numpy ndarray, (de)serialized as one block of memory."""
+    def __init__(self, submachine, maxlen=None):
+        super().__init__(submachine, maxlen)
+        self.dtypes = {e: np.dtype(e + submachine.code) for e in '<>='}
+
+    def serialize(self, buffer, value):
+        array = np.ascontiguousarray(value, dtype=self.dtypes[buffer._endian])
+        if self.maxlen is not None:
+            assert len(array) <= self.maxlen
+
+        buffer.align(2)
+        buffer.write('H', 2, len(array))
+        if len(array):
+            buffer.align(self.submachine.alignment)
+            buffer.write_bytes(memoryview(array).cast('B'))
+
+    def deserialize(self, buffer):
+        buffer.align(2)
+        num = buffer.read('H', 2)
+        if num:
+            buffer.align(self.submachine.alignment)
+        return _read_ndarray(buffer, self.dtypes[buffer._endian], num)
+
+    compile_size = SequenceMachine.compile_size
+    compile_serialize = Machine.compile_serialize
+    compile_deserialize = Machine.compile_deserialize
+
+
+def _read_ndarray(buffer, dtype, count):
+    # A view on the buffer if allowed and the data is in native byte order, a (byteswapped) copy otherwise
+    array = np.frombuffer(buffer._bytes, dtype=dtype, count=count, offset=buffer._pos)
+    buffer._pos += count * dtype.itemsize
+    if not dtype.isnative:
+        return array.astype(dtype.newbyteorder('='))
+    return array if buffer.views else array.copy()
+
 
 class UnionMachine(Machine):
     def __init__(self, type, discriminator_machine, labels_submachines, default=None):
@@ -369,9 +844,10 @@ class MappingMachine(Machine):
 
 
 class StructMachine(Machine):
-    def __init__(self, object, members_machines):
+    def __init__(self, object, members_machines, bypass_init=False):
         self.type = object
         self.members_machines = members_machines
+        self.bypass_init = bypass_init
 
     def serialize(self, buffer, value):
         #  We use the fact here that dicts retain their insertion order
@@ -388,12 +864,144 @@ class StructMachine(Machine):
         valuedict = {}
         for member, machine in self.members_machines.items():
             valuedict[member] = machine.deserialize(buffer)
+        return self.construct(valuedict)
+
+    def construct(self, valuedict):
+        if self.bypass_init:
+            value = object.__new__(self.type)
+            for member, v in valuedict.items():
+                object.__setattr__(value, member, v)
+            return value
         return self.type(**valuedict)
 
+    def skip(self, buffer):
+        for machine in self.members_machines.values():
+            machine.skip(buffer)
+
     def max_size(self, finder):
         for k, m in self.members_machines.items():
             m.max_size(finder)
 
+    def member_runs(self):
+        # Consecutive primitive members are grouped so they are packed with one struct
+        run = []
+        for member, machine in self.members_machines.items():
+            if type(machine) is PrimitiveMachine:
+                run.append((member, machine))
+                continue
+            if run:
+                yield run
+                run = []
+            yield [(member, machine)]
+        if run:
+            yield run
+
+    def fixed_size(self):
+        return all(machine.fixed_size() for machine in self.members_machines.values())
+
+    def compile_size(self, gen, value):
+        for run in self.member_runs():
+            if len(run) == 1:
+                member, machine = run[0]
+                machine.compile_size(gen, f"{value}.{member}" if value else None)
+            else:
+                gen.skip_run([(machine.alignment, machine.code) for _, machine in run])
+
+    def compile_serialize(self, gen, value):
+        struct = gen.variable('o')
+        gen.emit(f"{struct} = {value}")
+        for run in self.member_runs():
+            if len(run) == 1:
+                member, machine = run[0]
+                machine.compile_serialize(gen, f"{struct}.{member}")
+            else:
+                gen.pack_run(
+                    [(machine.alignment, machine.code) for _, machine in run],
+                    [f"{struct}.{member}" for member, _ in run]
+                )
+
+    def compile_deserialize(self, gen):
+        values = []
+        for run in self.member_runs():
+            if len(run) == 1:
+                member, machine = run[0]
+                values.append(f"{member}={machine.compile_deserialize(gen)}")
+            else:
+                variables = gen.unpack_run([(machine.alignment, machine.code) for _, machine in run])
+                values += [f"{member}={var}" for (member, _), var in zip(run, variables)]
+        return self.compile_construct(gen, values)
+
+    def compile_construct(self, gen, values):
+        # values are "member=expression" strings
+        var = gen.variable()
+        if not self.bypass_init:
+            gen.emit(f"{var} = {gen.bind(self.type, 'type')}({', '.join(values)})")
+            return var
+
+        gen.emit(f"{var} = {gen.bind(object.__new__, 'new')}({gen.bind(self.type, 'type')})")
+        if self.type.__setattr__ is object.__setattr__:
+            # Plain attribute stores are the cheapest way to fill the instance dict
+            for value in values:
+                gen.emit(f"{var}.{value}")
+        else:
+            # Frozen dataclasses and custom __setattr__ are passed by
+            setattr = gen.bind(object.__setattr__, 'setattr')
+            for value in values:
+                member, _, expr = value.partition('=')
+                gen.emit(f"{setattr}({var}, {member!r}, {expr})")
+        return var
+
+    def compile_skip(self, gen):
+        for run in self.member_runs():
+            if len(run) == 1:
+                run[0][1].compile_skip(gen)
+            else:
+                gen.skip_run([(machine.alignment, machine.code) for _, machine in run])
+
+
+class ProjectionMachine(StructMachine):
+    """Reads only the selected members of a struct into a record, the others are skipped."""
+    def __init__(self, machine, record, fields):
+        members = list(machine.members_machines)
+        # Nothing after the last selected member has to be read
+        last = max(members.index(field) for field in fields) if fields else -1
+        super().__init__(
+            record,
+            {member: machine.members_machines[member] for member in members[:last + 1]},
+            bypass_init=True
+        )
+        self.fields = set(fields)
+
+    def deserialize(self, buffer):
+        valuedict = {}
+        for member, machine in self.members_machines.items():
+            if member in self.fields:
+                valuedict[member] = machine.deserialize(buffer)
+            else:
+                machine.skip(buffer)
+        return self.construct(valuedict)
+
+    def compile_deserialize(self, gen):
+        values = []
+        for run in self.member_runs():
+            selected = [member for member, _ in run if member in self.fields]
+            if len(run) == 1:
+                member, machine = run[0]
+                if selected:
+                    values.append(f"{member}={machine.compile_deserialize(gen)}")
+                else:
+                    machine.compile_skip(gen)
+            elif selected:
+                # Unselected members become pad bytes in the struct format
+                variables = gen.unpack_run([
+                    (machine.alignment, machine.code if member in self.fields else f"{machine.alignment}x")
+                    for member, machine in run
+                ])
+                values += [f"{member}={var}" for member, var in zip(selected, variables)]
+            else:
+                gen.skip_run([(machine.alignment, machine.code) for _, machine in run])
+        return self.compile_construct(gen, values)
+
 
 class InstanceMachine(Machine):
     def __init__(self, object):
@@ -404,14 +1012,62 @@ class InstanceMachine(Machine):
         if value is None:
             print(f"Skipping the {self.type} object for now.")
             return
-        return value.serialize(buffer)
+        # Straight into the machine, CDR.serialize would copy the whole buffer
+        self.type.cdr.machine.serialize(buffer, value)
 
     def deserialize(self, buffer):
-        return self.type.deserialize(buffer)
+        return self.type.cdr.machine.deserialize(buffer)
+
+    def skip(self, buffer):
+        self.type.cdr.machine.skip(buffer)
 
     def max_size(self, finder):
         self.type.cdr.machine.max_size(finder)
 
+    def fixed_size(self):
+        return self.type.cdr.machine.fixed_size()
+
+    def compile_size(self, gen, value):
+        if self.fixed_size():
+            # Fixed size members do not look at the value at all
+            self.type.cdr.machine.compile_size(gen, None)
+            return
+        if gen.can_inline(self.type):
+            with gen.inline(self.type):
+                self.type.cdr.machine.compile_size(gen, value)
+            return
+        cdr = gen.bind(self.type.cdr, 'cdr')
+        gen.emit(f"pos = {cdr}.compiled({gen.endian!r}).serialized_size({value}, pos)")
+        gen.forget()
+
+    def compile_serialize(self, gen, value):
+        if gen.can_inline(self.type):
+            with gen.inline(self.type):
+                self.type.cdr.machine.compile_serialize(gen, value)
+            return
+        cdr = gen.bind(self.type.cdr, 'cdr')
+        gen.sync_out()
+        gen.emit(f"{cdr}.compiled({gen.endian!r}).serialize(buffer, {value})")
+        gen.sync_in()
+
+    def compile_deserialize(self, gen):
+        if gen.can_inline(self.type):
+            with gen.inline(self.type):
+                return self.type.cdr.machine.compile_deserialize(gen)
+        cdr = gen.bind(self.type.cdr, 'cdr')
+        var = gen.variable()
+        gen.sync_out()
+        gen.emit(f"{var} = {cdr}.compiled({gen.endian!r}).deserialize(buffer)")
+        gen.sync_in()
+        return var
+
+    def compile_skip(self, gen):
+        if gen.can_inline(self.type):
+            with gen.inline(self.type):
+                self.type.cdr.machine.compile_skip(gen)
+            return
+        self.compile_deserialize(gen)
+
 
 class DeferredInstanceMachine(Machine):
     def __init__(self, object_type_name, cdr):
@@ -423,18 +1079,48 @@ class DeferredInstanceMachine(Machine):
         self.type = type
 
     def serialize(self, buffer, value):
-        return value.serialize(buffer)
+        if not self.type:
+            raise TypeError(f"Deferred type {self.object_type_name} was never defined.")
+        self.type.cdr.machine.serialize(buffer, value)
 
     def deserialize(self, buffer):
         if not self.type:
             raise TypeError(f"Deferred type {self.object_type_name} was never defined.")
-        return self.type.deserialize(buffer)
+        return self.type.cdr.machine.deserialize(buffer)
+
+    def skip(self, buffer):
+        if not self.type:
+            raise TypeError(f"Deferred type {self.object_type_name} was never defined.")
+        self.type.cdr.machine.skip(buffer)
 
     def max_size(self, finder):
         if not self.type:
             raise TypeError(f"Deferred type {self.object_type_name} was never defined.")
         self.type.cdr.machine.max_size(finder)
 
+    def fixed_size(self):
+        return bool(self.type) and self.type.cdr.machine.fixed_size()
+
+    def compile_size(self, gen, value):
+        if not self.type:
+            return super().compile_size(gen, value)
+        InstanceMachine.compile_size(self, gen, value)
+
+    def compile_serialize(self, gen, value):
+        if not self.type:
+            return super().compile_serialize(gen, value)
+        InstanceMachine.compile_serialize(self, gen, value)
+
+    def compile_deserialize(self, gen):
+        if not self.type:
+            return super().compile_deserialize(gen)
+        return InstanceMachine.compile_deserialize(self, gen)
+
+    def compile_skip(self, gen):
+        if not self.type:
+            return super().compile_skip(gen)
+        InstanceMachine.compile_skip(self, gen)
+
 
 class EnumMachine(Machine):
     def __init__(self, enum):
@@ -449,6 +1135,29 @@ class EnumMachine(Machine):
     def max_size(self, finder: MaxSizeFinder):
         finder.increase(4, 4)
 
+    def fixed_size(self):
+        return True
+
+    def compile_size(self, gen, value):
+        gen.advance(4)
+
+    def compile_serialize(self, gen, value):
+        gen.reserve(4)
+        gen.emit(f"{gen.packer('I')}(data, pos, int({value}))")
+        gen.advance(4)
+
+    def compile_deserialize(self, gen):
+        var = gen.variable()
+        gen.emit(f"{var} = {gen.bind(self.enum, 'enum')}({gen.unpacker('I')}(data, pos)[0])")
+        gen.advance(4)
+        return var
+
+    def skip(self, buffer):
+        buffer._pos += 4
+
+    def compile_skip(self, gen):
+        gen.advance(4)
+
 
 def build_machine(cdr, _type, top=False) -> Machine:
     if type(_type) == str:
@@ -469,13 +1178,19 @@ def build_machine(cdr, _type, top=False) -> Machine:
                 # Edge case for python 3.6: bug in backport? TODO: investigate and report
                 holder = holder[0]
             if isinstance(holder, ArrayHolder):
+                submachine = build_machine(cdr, holder.type)
+                if cdr.numpy and type(submachine) is PrimitiveMachine:
+                    return NumpyArrayMachine(submachine, size=holder.length)
                 return ArrayMachine(
-                    build_machine(cdr, holder.type),
+                    submachine,
                     size=holder.length
                 )
             elif isinstance(holder, SequenceHolder):
+                submachine = build_machine(cdr, holder.type)
+                if cdr.numpy and type(submachine) is PrimitiveMachine:
+                    return NumpySequenceMachine(submachine, maxlen=holder.max_length)
                 return SequenceMachine(
-                    build_machine(cdr, holder.type),
+                    submachine,
                     maxlen=holder.max_length
                 )
             elif isinstance(holder, BoundStringHolder):
@@ -508,6 +1223,6 @@ def build_machine(cdr, _type, top=False) -> Machine:
     elif isclass(_type) and is_dataclass(_type) and top:
         _fields = get_type_hints(_type, include_extras=True)
         _members = {k: build_machine(cdr, v) for k, v in _fields.items()}
-        return StructMachine(_type, _members)
+        return StructMachine(_type, _members, bypass_init=cdr.bypass_init)
 
     raise TypeError(f"{repr(_type)} is not valid in CDR classes because it cannot be encoded.")
@@ -10,13 +10,20 @@
  * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
 """
 
-from .machinery import build_machine, Buffer, MaxSizeFinder, Endianness
+from .machinery import build_machine, buffer_pool, endian_codes, Buffer, MaxSizeFinder, Endianness, \
+    EnumMachine, Machine, PrimitiveMachine, ProjectionMachine, np
+from .lazy import LazyLayout
+from .codegen import CompiledMachine
 from .type_helper import get_type_hints
 
 from hashlib import md5
+from operator import attrgetter
+import struct
+from enum import Enum
 from inspect import isclass
 from collections import defaultdict
 from dataclasses import make_dataclass
+from typing import List, Optional, Tuple
 
 
 def module_prefix(cls):
@@ -41,6 +48,79 @@ def make_keyholder(datatype, keylist):
     return cls
 
 
+# Encapsulation header: representation identifier and options
+encapsulation = struct.Struct('>HH')
+CDR_BE = b'\x00\x00\x00\x00'
+CDR_LE = b'\x00\x01\x00\x00'
+
+
+def make_projection(datatype, fields):
+    hints = get_type_hints(datatype, include_extras=True)
+    for field in fields:
+        if field not in hints:
+            raise ValueError(f"{qualified_name(datatype)} has no member {field}.")
+    return make_dataclass(qualified_name(datatype) + "Projection", [(field, hints[field]) for field in fields])
+
+
+def fixed_offsets(machine, names):
+    # Offsets after the header and sizes of the named members, as long as only primitives precede them
+    offsets, offset = {}, 0
+    for name, member in machine.members_machines.items():
+        if len(offsets) == len(names):
+            break
+        if type(member) is PrimitiveMachine:
+            alignment = size = member.alignment
+        elif type(member) is EnumMachine:
+            alignment, size = 1, 4
+        else:
+            return None
+        offset += -offset & (alignment - 1)
+        if name in names:
+            offsets[name] = (4 + offset, size)
+        offset += size
+    return offsets, 4 + offset
+
+
+def signature(value, seen):
+    # A description of the encoding a machine implements that is the same in every process,
+    # nested types are described once, after that only by name
+    if isinstance(value, PrimitiveMachine):
+        # int and int64 are the same on the wire
+        return f"PrimitiveMachine({value.code})"
+    if isinstance(value, Machine):
+        attributes = sorted((k, v) for k, v in vars(value).items() if not k.startswith('_') and k not in signature.ignore)
+        return f"{type(value).__name__}({', '.join(f'{k}={signature(v, seen)}' for k, v in attributes)})"
+    if isinstance(value, dict):
+        return f"{{{', '.join(f'{signature(k, seen)}: {signature(v, seen)}' for k, v in value.items())}}}"
+    if isinstance(value, (list, tuple)):
+        return f"[{', '.join(signature(v, seen) for v in value)}]"
+    if isinstance(value, (Enum, str, int, float, bool, type(None))):
+        return repr(value)
+    if isclass(value) and issubclass(value, Enum):
+        return f"{qualified_name(value)}{[(e.name, e.value) for e in value]}"
+    if isclass(value) and hasattr(value, 'cdr') and value not in seen:
+        seen.add(value)
+        return f"{qualified_name(value)}{signature(value.cdr.machine, seen)}"
+    if isclass(value):
+        return qualified_name(value)
+    return type(value).__name__
+
+
+# Attributes that do not change the encoding
+signature.ignore = {'structs', 'dtypes', 'bypass_init', 'object_type_name'}
+
+
+def open_buffer(data, views=False):
+    buffer = Buffer(data, views=views) if not isinstance(data, Buffer) else data
+
+    if buffer.tell() == 0:
+        identifier, _ = encapsulation.unpack_from(buffer._bytes, 0)
+        buffer.set_endianness(Endianness.Big if identifier & 0xff == 0 else Endianness.Little)
+        buffer.seek(4)
+
+    return buffer
+
+
 class CDR:
     defined_references = {}
     deferred_references = defaultdict(list)
@@ -62,8 +142,11 @@ class CDR:
         del cls.deferred_references[type_name]
         cls.defined_references[type_name] = object
 
-    def __init__(self, datatype, final=True, mutable=False, appendable=False, nested=False, autoid_hash=False, keylist=None):
-        self.buffer = Buffer()
+    def __init__(self, datatype, final=True, mutable=False, appendable=False, nested=False, autoid_hash=False, keylist=None,
+                 numpy=False, bypass_init=False):
+        if numpy and np is None:
+            raise ImportError("Using numpy=True for CDR types requires numpy to be installed.")
+
         self.datatype = datatype
         self.typename = qualified_name(datatype, sep='::')
         self.final = final
@@ -72,6 +155,8 @@ class CDR:
         self.nested = nested
         self.autoid_hash = autoid_hash
         self.keylist = keylist
+        self.numpy = numpy
+        self.bypass_init = bypass_init
 
         self.keyholder = make_keyholder(datatype, keylist) if keylist else datatype
 
@@ -79,6 +164,15 @@ class CDR:
         self.key_machine = build_machine(self, self.keyholder, True) if keylist else self.machine
 
         self.keyless = keylist is None
+        self._compiled = {}
+        self._compiled_key = None
+        self._key_packer = None
+        self._key_layout = None
+        self._key_projection = None
+        self._lazy = {}
+        self._projections = {}
+        self._fixed_size = None
+        self._typehash = None
 
     def finalize(self):
         if not hasattr(self, 'key_max_size'):
@@ -86,67 +180,263 @@ class CDR:
             self.key_machine.max_size(finder)
             self.key_max_size = finder.size
 
+    def typehash(self) -> bytes:
+        """md5 of the name, keys and encoding of the type, the same in every process that defines it the same way."""
+        if self._typehash is None:
+            description = f"{self.typename} {self.keylist} {signature(self.machine, {self.datatype})}"
+            self._typehash = md5(description.encode('utf-8')).digest()
+        return self._typehash
+
+    def compiled(self, endian):
+        # Generated lazily: deferred types have to be resolved before compiling
+        compiled = self._compiled.get(endian)
+        if compiled is None:
+            compiled = self._compiled[endian] = CompiledMachine(self.machine, endian)
+        return compiled
+
+    def serialized_size(self, object) -> int:
+        """The exact number of bytes serialize returns for object, including the encapsulation header."""
+        if self._fixed_size is None:
+            fixed = self.machine.fixed_size()
+            self._fixed_size = self.compiled('=').serialized_size(None, 4) if fixed else False
+        if self._fixed_size:
+            return self._fixed_size
+        return self.compiled('=').serialized_size(object, 4)
+
     def serialize(self, object, buffer=None, endianness=None) -> bytes:
-        buffer = buffer or self.buffer.seek(0)
+        if buffer is None:
+            # A buffer of our own from the pool of this thread, serialize is reentrant and thread safe
+            pool = buffer_pool()
+            buffer = pool.acquire(self.serialized_size(object), endianness)
+            try:
+                return self.serialize(object, buffer)
+            finally:
+                pool.release(buffer)
+
         if endianness is not None:
             buffer.set_endianness(endianness)
 
         if buffer.tell() == 0:
-            if buffer.endianness == Endianness.Big:
-                buffer.write('b', 1, 0)
-                buffer.write('b', 1, 0)
-                buffer.write('b', 1, 0)
-                buffer.write('b', 1, 0)
-            else:
-                buffer.write('b', 1, 0)
-                buffer.write('b', 1, 1)
-                buffer.write('b', 1, 0)
-                buffer.write('b', 1, 0)
-
-        self.machine.serialize(buffer, object)
-        return buffer.asbytes()
-
-    def deserialize(self, data) -> object:
-        buffer = Buffer(data) if not isinstance(data, Buffer) else data
+            buffer.write_bytes(CDR_BE if buffer.endianness == Endianness.Big else CDR_LE)
 
-        if buffer.tell() == 0:
-            buffer.read('b', 1)
-            v = buffer.read('b', 1)
-            if v == 0:
-                buffer.set_endianness(Endianness.Big)
-            else:
-                buffer.set_endianness(Endianness.Little)
-            buffer.read('b', 1)
-            buffer.read('b', 1)
+        self.compiled(buffer._endian).serialize(buffer, object)
+        return buffer.asbytes()
 
-        return self.machine.deserialize(buffer)
+    def serialize_into(self, object, data, endianness=None) -> int:
+        """Serialize object into the writable bytes-like data, returns the size of the serialized object.
+
+        If data is too small nothing is written, call again with data of at least the returned size.
+        """
+        size = self.serialized_size(object)
+        buffer = Buffer(data)
+        if size > buffer._size:
+            return size
+
+        # Alignment padding is skipped over, not written, so it is cleared first
+        target = buffer._bytes
+        target[:size] = bytes(size)
+        buffer.set_endianness(endianness or Endianness.native())
+        buffer.write_bytes(CDR_BE if buffer.endianness == Endianness.Big else CDR_LE)
+        self.compiled(buffer._endian).serialize(buffer, object)
+        if buffer._bytes is not target:
+            # Runs of primitives reserve room for their largest padding, near the end of
+            # data that can move the buffer to a bigger copy
+            target[:size] = buffer._bytes[:size]
+        return size
+
+    def serialize_into_with_keyhash(self, object, data, endianness=None) -> Tuple[int, Optional[bytes]]:
+        """serialize_into that also returns the keyhash of object, or None if nothing was written.
+
+        The C layer serializes keyed samples with a single call into python this way, the keyhash
+        is made like in serialize_with_keyhash.
+        """
+        size = self.serialize_into(object, data, endianness)
+        view = memoryview(data).cast('B')
+        if size > len(view):
+            return size, None
+        return size, self._keyhash_of_serialized(object, view[:size])
+
+    def serialize_with_keyhash(self, object, endianness=None) -> Tuple[bytes, bytes]:
+        """Serialize object and compute its keyhash in one call.
+
+        When the key members are at fixed offsets the key is copied out of the serialized data,
+        otherwise they are encoded a second time for the key.
+        """
+        data = self.serialize(object, endianness=endianness)
+        return data, self._keyhash_of_serialized(object, data)
+
+    def _keyhash_of_serialized(self, object, data):
+        # data is object serialized
+        if self.keyless:
+            return bytes(16)
+        if self._key_layout is None:
+            self._key_layout = self.key_layout() or False
+        if not self._key_layout:
+            return self.keyhash(object)
+
+        size, fields = self._key_layout
+        key = bytearray(size)
+        swap = data[1] & 1
+        for data_offset, key_offset, length in fields:
+            member = bytes(data[data_offset:data_offset + length])
+            key[key_offset:key_offset + length] = member[::-1] if swap else member
+        return self._hash_key(key)
+
+    def deserialize(self, data, views=False, lazy=False) -> object:
+        buffer = open_buffer(data, views)
+        if lazy:
+            return self.lazy_layout(buffer).sample(buffer)
+        return self.compiled(buffer._endian).deserialize(buffer)
+
+    def serialize_many(self, objects, endianness=None) -> Tuple[bytearray, List[Tuple[int, int]]]:
+        """Serialize objects into one buffer, returns it with the (start, end) offset of every sample.
+
+        Every sample has its own encapsulation header and starts at a multiple of 8 bytes.
+        """
+        endianness = endianness or Endianness.native()
+        header = CDR_BE if endianness == Endianness.Big else CDR_LE
+
+        objects = list(objects)
+        offsets, pos = [], 0
+        for object in objects:
+            end = pos + self.serialized_size(object)
+            offsets.append((pos, end))
+            pos = (end + 7) & ~7
+
+        data = bytearray(offsets[-1][1] if offsets else 0)
+        buffer = Buffer(data)
+        target = buffer._bytes
+        buffer.set_endianness(endianness)
+        serialize = self.compiled(buffer._endian).serialize
+        for object, (start, _) in zip(objects, offsets):
+            buffer._bytes[start:start + 4] = header
+            serialize(buffer.seek(start + 4), object)
+        if buffer._bytes is not target:
+            # Runs of primitives reserve room for their largest padding, the last sample
+            # can move the buffer to a bigger copy
+            data[:] = buffer._bytes[:len(data)]
+        return data, offsets
+
+    def deserialize_many(self, data, offsets, views=False) -> List[object]:
+        """Deserialize the samples at the (start, end) offsets in data, as returned by serialize_many."""
+        data = memoryview(data).cast('B')
+        deserializers = {}
+        objects = []
+        for start, end in offsets:
+            # Alignment is relative to the start of the sample, so every sample gets its own buffer
+            buffer = Buffer(data[start:end], views=views).seek(4)
+            identifier, _ = encapsulation.unpack_from(data, start)
+            buffer.set_endianness(Endianness.Big if identifier & 0xff == 0 else Endianness.Little)
+            deserialize = deserializers.get(buffer._endian)
+            if deserialize is None:
+                deserialize = deserializers[buffer._endian] = self.compiled(buffer._endian).deserialize
+            objects.append(deserialize(buffer))
+        return objects
+
+    def lazy_layout(self, buffer):
+        layout = self._lazy.get(buffer._endian)
+        if layout is None:
+            layout = self._lazy[buffer._endian] = LazyLayout(self.machine, buffer.endianness, buffer._endian)
+        return layout
+
+    def projection(self, *fields) -> 'Projection':
+        """Deserializer that only decodes the given members, into a record with just those members."""
+        projection = self._projections.get(fields)
+        if projection is None:
+            projection = self._projections[fields] = Projection(self, fields)
+        return projection
+
+    def key_layout(self) -> Optional[Tuple[int, List[Tuple[int, int, int]]]]:
+        """Where the key members are in every serialized sample, if that is fixed.
+
+        Returns the size of the key and a (data offset, key offset, size) triple per key member, offsets
+        include the header. The key is the members copied big-endian into a zeroed key. None when a key
+        member is not a primitive or enum, or is preceded by something that is not.
+        """
+        if self.keyless:
+            return None
+        names = list(self.keyholder.cdr.machine.members_machines)
+        data, key = fixed_offsets(self.machine, names), fixed_offsets(self.keyholder.cdr.machine, names)
+        if data is None or key is None:
+            return None
+        return key[1], [(data[0][name][0], key[0][name][0], key[0][name][1]) for name in names]
 
     def key(self, object) -> bytes:
-        self.buffer.seek(0)
-        self.buffer.set_endianness(Endianness.Big)
-        self.buffer.write('b', 1, 0)
-        self.buffer.write('b', 1, 0)
-        self.buffer.write('b', 1, 0)
-        self.buffer.write('b', 1, 0)
-
-        self.key_machine.serialize(self.buffer, object)
-        return self.buffer.asbytes()
+        pool = buffer_pool()
+        buffer = pool.acquire(pool.min_size, Endianness.Big)
+        try:
+            buffer.write_bytes(CDR_BE)
+            if self._compiled_key is None:
+                self._compiled_key = CompiledMachine(self.key_machine, endian_codes[Endianness.Big])
+            self._compiled_key.serialize(buffer, object)
+            return buffer.asbytes()
+        finally:
+            pool.release(buffer)
+
+    def _make_key_packer(self):
+        # Keys that are only primitives have a fixed layout: the key is one big-endian
+        # struct of the key members, header included, no buffer needed.
+        machines = self.keyholder.cdr.machine.members_machines
+        if not machines or any(type(machine) is not PrimitiveMachine for machine in machines.values()):
+            return False
+
+        fmt, offset = '>4x', 0
+        for machine in machines.values():
+            padding = -offset & (machine.alignment - 1)
+            fmt += 'x' * padding + machine.code
+            offset += padding + machine.alignment
+        pack, values = struct.Struct(fmt).pack, attrgetter(*machines)
+        if len(machines) == 1:
+            return lambda object: pack(values(object))
+        return lambda object: pack(*values(object))
 
     def keyhash(self, object) -> bytes:
+        if self.keyless:
+            # All samples of a keyless type are the same instance
+            return bytes(16)
+
+        if self._key_packer is None:
+            self._key_packer = self._make_key_packer()
+        return self._hash_key(self._key_packer(object) if self._key_packer else self.key(object))
+
+    def _hash_key(self, key):
         if not hasattr(self, 'key_max_size'):
             self.finalize()
 
-        if self.key_max_size <= 16:
-            return self.key(object).ljust(16, b'\0')
-        
-        m = md5()
-        m.update(self.key(object))
-        return m.digest()
+        # The key includes the 4 byte header, only keys that always fit in 16 bytes are used as is
+        if self.key_max_size + 4 <= 16:
+            return bytes(key.ljust(16, b'\0'))
+        return md5(key).digest()
+
+    def keyhash_from_serialized(self, data) -> bytes:
+        """The keyhash of a serialized sample, only the key members are decoded, the rest is skipped."""
+        if self.keyless:
+            return bytes(16)
+        if self._key_projection is None:
+            self._key_projection = self.projection(*self.keyholder.cdr.machine.members_machines)
+        return self.keyhash(self._key_projection.deserialize(data))
+
+
+class Projection:
+    """Deserializes only some members of a type, the others are skipped without being decoded."""
+    def __init__(self, cdr, fields):
+        self.cdr = cdr
+        self.fields = fields
+        self.type = make_projection(cdr.datatype, fields)
+        self.machine = ProjectionMachine(cdr.machine, self.type, fields)
+        self._compiled = {}
+
+    def deserialize(self, data, views=False) -> object:
+        buffer = open_buffer(data, views)
+        compiled = self._compiled.get(buffer._endian)
+        if compiled is None:
+            compiled = self._compiled[buffer._endian] = CompiledMachine(self.machine, buffer._endian)
+        return compiled.deserialize(buffer)
 
 
 def proto_serialize(self, buffer=None, endianness=None):
     return self.cdr.serialize(self, buffer=buffer, endianness=endianness)
 
 
-def proto_deserialize(cls, data):
-    return cls.cdr.deserialize(data)
+def proto_deserialize(cls, data, views=False, lazy=False):
+    return cls.cdr.deserialize(data, views=views, lazy=lazy)
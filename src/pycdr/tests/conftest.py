@@ -1,4 +1,8 @@
 import pytest
+import pycdr.codegen
+
+# Generated code that fails where the machines do not is an error in the tests
+pycdr.codegen.strict = True
 
 # Allow the import of support modules for tests
 import os.path as p
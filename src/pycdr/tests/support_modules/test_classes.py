@@ -1,7 +1,9 @@
 from pycdr import cdr
 import pycdr.types as pt
 
+from dataclasses import dataclass, field
 from enum import IntEnum, auto
+from typing import Dict
 
 
 
@@ -95,3 +97,82 @@ class EasyUnion:
 @cdr
 class SingleUnion:
     value: EasyUnion
+
+
+@cdr
+class MixedRuns:
+    a: pt.int8
+    b: pt.int32
+    c: pt.float64
+    d: str
+    e: pt.int16
+    f: pt.int64
+    g: pt.sequence[pt.float32]
+    h: pt.array[pt.int16, 3]
+
+
+@cdr
+class SingleBytes:
+    value: bytes
+
+
+@cdr
+class NestedSequence:
+    nested: SingleNested
+    values: pt.sequence[MixedRuns]
+
+
+@cdr(bypass_init=True)
+class BypassInit:
+    a: pt.int32
+    b: pt.int32
+    c: str
+    d: pt.sequence[int] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.initialized = True
+
+
+@cdr(bypass_init=True)
+@dataclass(frozen=True)
+class FrozenBypassInit:
+    a: pt.int32
+    b: str
+
+
+@cdr(keylist=['a', 'c'])
+class KeyedMixed:
+    a: pt.int8
+    b: str
+    c: pt.int64
+    d: float
+
+
+@cdr(keylist=['b', 'c', 'd'])
+class KeyedFixed:
+    a: pt.int8
+    b: pt.int64
+    c: BasicEnum
+    d: pt.int16
+    e: str
+
+
+@cdr(keylist=['name'])
+class KeyedString:
+    values: pt.sequence[pt.int16]
+    name: str
+    extra: str
+
+
+@pt.union(int)
+class StringUnion:
+    a: pt.case[1, str]
+    b: pt.case[2, int]
+
+
+@cdr
+class StringContainers:
+    mapping: Dict[str, int]
+    union: StringUnion
+    values: pt.sequence[str]
+    data: bytes
@@ -0,0 +1,131 @@
+import threading
+import test_classes as tc
+
+from pycdr.machinery import Buffer, BufferPool, Endianness, buffer_pool
+
+
+def test_buffer_wraps_without_copy():
+    data = bytearray(b"\x00\x01\x00\x00abcd")
+    buffer = Buffer(data)
+    data[4] = ord('z')
+    assert buffer.read_bytes(8)[4:5] == b"z"
+
+
+def test_deserialize_from_memoryview():
+    v1 = tc.SingleString(value="Hello, World!")
+    data = memoryview(v1.serialize())
+    assert tc.SingleString.deserialize(data) == v1
+    assert tc.SingleString.deserialize(data[0:]) == v1
+
+
+def test_bytes_members_copy_by_default():
+    data = bytearray(tc.SingleBytes(value=b"abc").serialize())
+    v = tc.SingleBytes.deserialize(data)
+    assert type(v.value) == bytes
+    assert v.value == b"abc"
+
+
+def test_bytes_members_as_views():
+    data = bytearray(tc.SingleBytes(value=b"abc").serialize())
+    v = tc.SingleBytes.deserialize(data, views=True)
+    assert isinstance(v.value, memoryview)
+    assert v.value == b"abc"
+
+    data[-1] = ord('x')
+    assert v.value == b"abx"
+
+
+def test_strings_with_views():
+    # Views only apply to bytes members, strings in every container are decoded
+    value = tc.StringContainers(mapping={'a': 1, 'bc': 2}, union=tc.StringUnion(a="union"), values=["x", "yz"], data=b"abc")
+    v = tc.StringContainers.deserialize(value.serialize(), views=True)
+    assert v.mapping == value.mapping and type(next(iter(v.mapping))) is str
+    assert v.union == value.union and type(v.union.value) is str
+    assert v.values == value.values and type(v.values[0]) is str
+    assert isinstance(v.data, memoryview) and v.data == b"abc"
+
+
+def test_native_endianness_does_not_swap():
+    buffer = Buffer()
+    buffer.set_endianness(Endianness.native())
+    assert buffer._endian == '='
+
+    other = Endianness.Big if Endianness.native() == Endianness.Little else Endianness.Little
+    buffer.set_endianness(other)
+    assert buffer._endian in '<>'
+    buffer.write('I', 4, 1)
+    assert buffer.asbytes() == (b'\x00\x00\x00\x01' if other == Endianness.Big else b'\x01\x00\x00\x00')
+
+
+def test_pool_reuses_buffers():
+    pool = BufferPool()
+    buffer = pool.acquire(1000)
+    assert len(buffer._bytes) == 1024
+    data = buffer._bytes.obj
+    pool.release(buffer)
+    assert pool.acquire(600)._bytes.obj is data
+
+
+def test_pool_clears_released_buffers():
+    pool = BufferPool()
+    buffer = pool.acquire(100)
+    buffer.write_bytes(b"\xff" * 100)
+    pool.release(buffer)
+    assert pool.acquire(100)._bytes == bytes(pool.min_size)
+
+
+def test_padding_of_pooled_buffers_is_zero():
+    tc.SingleString(value="\xff" * 300).serialize()
+    data = tc.KeyedMixed(a=1, b="x", c=2, d=0.5).serialize()
+    assert data[5:8] == bytes(3)
+    assert data[14:16] == bytes(2)
+
+
+def test_pool_does_not_keep_large_buffers():
+    pool = BufferPool()
+    buffer = pool.acquire(pool.max_size + 1)
+    pool.release(buffer)
+    assert not pool._free
+
+
+def test_pool_shrinks_unused_classes():
+    pool = BufferPool()
+    pool.release(pool.acquire(4096))
+    for _ in range(2 * pool.shrink_interval):
+        pool.release(pool.acquire(100))
+    assert 4096 not in pool._free
+    assert 512 in pool._free
+
+
+def test_serialize_large_sample():
+    value = tc.SingleString(value="a" * (BufferPool.max_size + 1))
+    assert tc.SingleString.deserialize(value.serialize()) == value
+    assert all(size <= BufferPool.max_size for size in buffer_pool()._free)
+
+
+def test_key_during_serialize():
+    # Keys are computed with a buffer of their own, nothing is overwritten
+    value = tc.Keyed(a=1, b=2)
+    buffer = buffer_pool().acquire(64)
+    buffer.write_bytes(b"\x00\x01\x00\x00")
+    tc.Keyed.cdr.compiled(buffer._endian).serialize(buffer, value)
+    key = tc.Keyed.cdr.key(value)
+    assert buffer.asbytes() == value.serialize()
+    assert key == tc.Keyed.cdr.key(value)
+
+
+def test_serialize_from_threads():
+    values = [tc.SingleString(value=str(i) * (i % 50)) for i in range(200)]
+    expected = [value.serialize() for value in values]
+
+    def worker(results):
+        for _ in range(20):
+            results.append([value.serialize() for value in values])
+
+    results = []
+    threads = [threading.Thread(target=worker, args=(results,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(result == expected for result in results)
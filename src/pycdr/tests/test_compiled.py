@@ -0,0 +1,302 @@
+import hashlib
+import pytest
+import test_classes as tc
+
+from pycdr import cdr
+from pycdr import codegen
+from pycdr.codegen import CompiledMachine
+from pycdr.machinery import Buffer, Endianness, PrimitiveMachine
+import pycdr.types as pt
+
+
+compiled_test_data = [
+    tc.SingleInt(1000),
+    tc.SingleString("Hello, Wörld!"),
+    tc.SingleFloat(1.02),
+    tc.SingleBool(True),
+    tc.SingleSequence([1, 2, 3]),
+    tc.SingleArray([0, 1, 2]),
+    tc.SingleUint16(65535),
+    tc.SingleBoundedSequence([100, 1, 1]),
+    tc.SingleBoundedString("123456789"),
+    tc.SingleEnum(tc.BasicEnum.Two),
+    tc.SingleNested(tc.SingleInt(1)),
+    tc.Keyed(a=1, b=2),
+    tc.AllPrimitives(),
+    tc.SingleUnion(tc.EasyUnion(b=True)),
+    tc.NestedSequence(
+        nested=tc.SingleNested(tc.SingleInt(7)),
+        values=[tc.MixedRuns(a=i, b=2, c=3.0, d="x" * i, e=5, f=6, g=[7.0] * i, h=[9, 10, 11]) for i in range(3)]
+    )
+]
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+@pytest.mark.parametrize("value", compiled_test_data)
+def test_compiled_matches_machine(value, endianness):
+    machine_buffer = Buffer().seek(4)
+    machine_buffer.set_endianness(endianness)
+    type(value).cdr.machine.serialize(machine_buffer, value)
+
+    compiled_buffer = Buffer().seek(4)
+    compiled_buffer.set_endianness(endianness)
+    compiled = type(value).cdr.compiled(compiled_buffer._endian)
+    compiled.serialize(compiled_buffer, value)
+
+    assert compiled_buffer.asbytes() == machine_buffer.asbytes()
+
+    read_buffer = Buffer(compiled_buffer.asbytes()).seek(4)
+    read_buffer.set_endianness(endianness)
+    assert compiled.deserialize(read_buffer) == value
+    assert read_buffer.tell() == compiled_buffer.tell()
+
+
+def test_compiled_is_cached():
+    assert tc.SingleInt.cdr.compiled('<') is tc.SingleInt.cdr.compiled('<')
+
+
+def test_compiled_errors_match_machine():
+    with pytest.raises(Exception) as exc:
+        tc.SingleBoundedString(value="a" * 11).serialize()
+    assert "Failed to encode member value" in str(exc.value)
+
+
+class BrokenMachine(PrimitiveMachine):
+    def __init__(self, error):
+        super().__init__(int)
+        self.error = error
+
+    def compile_serialize(self, gen, value):
+        gen.emit(f"raise {self.error}('generated')")
+
+
+def test_compiled_recovery_is_reported(monkeypatch):
+    compiled = CompiledMachine(BrokenMachine('TypeError'), '<')
+    with pytest.raises(RuntimeError):
+        compiled.serialize(Buffer().seek(4), 1)
+
+    monkeypatch.setattr(codegen, 'strict', False)
+    monkeypatch.setattr(codegen, 'recoveries', codegen.Counter())
+    buffer = Buffer().seek(4)
+    with pytest.warns(RuntimeWarning):
+        compiled.serialize(buffer, 1)
+    assert buffer.tell() == 12
+    assert codegen.recoveries[('serialize', 'int')] == 1
+
+
+def test_compiled_unexpected_errors_propagate():
+    compiled = CompiledMachine(BrokenMachine('NameError'), '<')
+    with pytest.raises(NameError):
+        compiled.serialize(Buffer().seek(4), 1)
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+@pytest.mark.parametrize("offset", range(8))
+def test_compiled_primitive_runs(offset, endianness):
+    value = tc.MixedRuns(a=1, b=2, c=3.0, d="four", e=5, f=6, g=[7.0, 8.0], h=[9, 10, 11])
+
+    machine_buffer = Buffer().seek(4 + offset)
+    machine_buffer.set_endianness(endianness)
+    tc.MixedRuns.cdr.machine.serialize(machine_buffer, value)
+
+    compiled_buffer = Buffer().seek(4 + offset)
+    compiled_buffer.set_endianness(endianness)
+    compiled = tc.MixedRuns.cdr.compiled(compiled_buffer._endian)
+    compiled.serialize(compiled_buffer, value)
+
+    assert compiled_buffer.asbytes() == machine_buffer.asbytes()
+
+    read_buffer = Buffer(compiled_buffer.asbytes()).seek(4 + offset)
+    read_buffer.set_endianness(endianness)
+    assert compiled.deserialize(read_buffer) == value
+
+
+def test_compiled_primitive_run_is_one_struct():
+    source = tc.AllPrimitives.cdr.compiled('<').serialize.source
+    assert source.count("pack_into") == 1
+
+
+def test_compiled_nested_is_inlined():
+    for endian in '<>':
+        compiled = tc.NestedSequence.cdr.compiled(endian)
+        assert ".compiled(" not in compiled.serialize.source
+        assert ".compiled(" not in compiled.deserialize.source
+        assert ".compiled(" not in compiled.serialized_size.source
+
+
+def test_nested_machine_does_not_copy(monkeypatch):
+    value = compiled_test_data[-1]
+    calls = []
+    asbytes = Buffer.asbytes
+    monkeypatch.setattr(Buffer, "asbytes", lambda self: calls.append(self) or asbytes(self))
+
+    buffer = Buffer().seek(4)
+    tc.NestedSequence.cdr.machine.serialize(buffer, value)
+    assert not calls
+
+    assert tc.NestedSequence.cdr.machine.deserialize(Buffer(buffer.asbytes()).seek(4)) == value
+
+
+@pytest.mark.parametrize("value", compiled_test_data)
+def test_serialized_size(value):
+    assert type(value).cdr.serialized_size(value) == len(value.serialize())
+
+
+def test_serialized_size_fixed():
+    assert tc.AllPrimitives.cdr.serialized_size(None) == len(tc.AllPrimitives().serialize())
+
+
+@pytest.mark.parametrize("value", [tc.BypassInit(1, 2, "three", [4]), tc.FrozenBypassInit(1, "two")])
+def test_bypass_init(value):
+    cls = type(value)
+    data = value.serialize()
+
+    buffer = Buffer(data).seek(4)
+    buffer.set_endianness(Endianness.Little)
+    for result in (cls.deserialize(data), cls.cdr.machine.deserialize(buffer)):
+        assert result == value
+        assert not hasattr(result, "initialized")
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_serialize_many(endianness):
+    values = [tc.MixedRuns(a=i, b=2, c=3.0, d="x" * i, e=5, f=6, g=[7.0] * i, h=[9, 10, 11]) for i in range(5)]
+    data, offsets = tc.MixedRuns.cdr.serialize_many(values, endianness=endianness)
+
+    assert type(data) is bytearray
+    assert len(data) == offsets[-1][1]
+    assert len(offsets) == len(values)
+    for value, (start, end) in zip(values, offsets):
+        assert start % 8 == 0
+        assert end - start == len(value.serialize(endianness=endianness))
+        assert tc.MixedRuns.deserialize(data[start:end]) == value
+    assert tc.MixedRuns.cdr.deserialize_many(data, offsets) == values
+
+
+def test_deserialize_many_unaligned():
+    values = [tc.MixedRuns(a=i, b=2, c=3.0, d="x" * i, e=5, f=6, g=[7.0] * i, h=[9, 10, 11]) for i in range(5)]
+    data, offsets = b"", []
+    for i, value in enumerate(values):
+        encoded = value.serialize(endianness=Endianness.Big if i % 2 else Endianness.Little)
+        offsets.append((len(data), len(data) + len(encoded)))
+        data += encoded
+    assert tc.MixedRuns.cdr.deserialize_many(data, offsets) == values
+
+
+def test_serialize_many_empty():
+    data, offsets = tc.MixedRuns.cdr.serialize_many([])
+    assert type(data) is bytearray
+    assert data == bytearray() and offsets == []
+
+
+@pytest.mark.parametrize("value", [
+    tc.Keyed(a=1, b=2),
+    tc.KeyedMixed(a=3, b="four", c=5, d=6.0),
+    tc.KeyedFixed(a=1, b=-2, c=tc.BasicEnum.Two, d=3, e="four")
+])
+def test_keyhash_matches_key(value):
+    cdr = type(value).cdr
+    cdr.finalize()
+    key = cdr.key(value)
+    expected = key.ljust(16, b"\0") if len(key) <= 16 else hashlib.md5(key).digest()
+
+    assert len(cdr.keyhash(value)) == 16
+    assert cdr.keyhash(value) == expected
+    for endianness in (Endianness.Little, Endianness.Big):
+        assert cdr.serialize_with_keyhash(value, endianness) == (value.serialize(endianness=endianness), expected)
+
+
+@pytest.mark.parametrize("value", [tc.Keyed(a=1, b=2), tc.KeyedFixed(a=1, b=-2, c=tc.BasicEnum.Two, d=3, e="four")])
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_key_layout(value, endianness):
+    size, fields = value.cdr.key_layout()
+    data = value.serialize(endianness=endianness)
+    key = bytearray(size)
+    for data_offset, key_offset, length in fields:
+        member = data[data_offset:data_offset + length]
+        key[key_offset:key_offset + length] = member if data[1] == 0 else member[::-1]
+    assert key == value.cdr.key(value)
+
+
+def test_key_layout_variable():
+    assert tc.KeyedMixed.cdr.key_layout() is None
+    assert tc.KeyedString.cdr.key_layout() is None
+    assert tc.SingleString.cdr.key_layout() is None
+
+
+def test_keyless_keyhash():
+    value = tc.SingleString(value="keyless")
+    assert value.cdr.keyhash(value) == bytes(16)
+    assert value.cdr.keyhash_from_serialized(value.serialize()) == bytes(16)
+    assert value.cdr.serialize_with_keyhash(value) == (value.serialize(), bytes(16))
+
+
+@pytest.mark.parametrize("value", [
+    tc.Keyed(a=1, b=2),
+    tc.KeyedMixed(a=3, b="four", c=5, d=6.0),
+    tc.KeyedString(values=[1, 2, 3], name="seven", extra="eight")
+])
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_keyhash_from_serialized(value, endianness):
+    cdr = value.cdr
+    data = value.serialize(endianness=endianness)
+    assert cdr.keyhash_from_serialized(data) == cdr.keyhash(value)
+    assert cdr.keyhash_from_serialized(memoryview(data)) == cdr.keyhash(value)
+
+
+@pytest.mark.parametrize("value", compiled_test_data)
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_serialize_into(value, endianness):
+    data = value.serialize(endianness=endianness)
+    target = bytearray(b"\xff" * (len(data) + 8))
+    assert value.cdr.serialize_into(value, memoryview(target), endianness) == len(data)
+    assert target[:len(data)] == data
+
+    exact = bytearray(len(data))
+    assert value.cdr.serialize_into(value, exact, endianness) == len(data)
+    assert exact == data
+
+    small = bytearray(len(data) - 1)
+    assert value.cdr.serialize_into(value, small, endianness) == len(data)
+    assert small == bytearray(len(data) - 1)
+
+
+@pytest.mark.parametrize("value", [
+    tc.Keyed(a=1, b=2),
+    tc.KeyedFixed(a=1, b=-2, c=tc.BasicEnum.Two, d=3, e="four"),
+    tc.KeyedMixed(a=3, b="four", c=5, d=6.0),
+    tc.KeyedString(values=[1, 2, 3], name="seven", extra="eight")
+])
+def test_serialize_into_with_keyhash(value):
+    data = value.serialize()
+    target = bytearray(len(data))
+    assert value.cdr.serialize_into_with_keyhash(value, target) == (len(data), value.cdr.keyhash(value))
+    assert target == data
+    assert value.cdr.serialize_into_with_keyhash(value, bytearray(len(data) - 1)) == (len(data), None)
+
+
+def test_typehash():
+    @cdr
+    class Point:
+        x: int
+        y: int
+
+    assert len(Point.cdr.typehash()) == 16
+    assert Point.cdr.typehash() == Point.cdr.typehash()
+    assert tc.MixedRuns.cdr.typehash() != tc.NestedSequence.cdr.typehash()
+
+    Original = Point
+
+    @cdr
+    class Point:
+        x: pt.int64
+        y: int
+
+    assert Point.cdr.typehash() == Original.cdr.typehash()
+
+    @cdr
+    class Point:
+        x: pt.int32
+        y: int
+
+    assert Point.cdr.typehash() != Original.cdr.typehash()
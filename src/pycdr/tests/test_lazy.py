@@ -0,0 +1,71 @@
+import pytest
+import test_classes as tc
+
+from pycdr.lazy import LazySample
+from pycdr.machinery import Buffer, Endianness
+
+
+lazy_test_data = [
+    tc.SingleString("Hello, Wörld!"),
+    tc.SingleSequence([1, 2, 3]),
+    tc.SingleEnum(tc.BasicEnum.Two),
+    tc.SingleNested(tc.SingleInt(1)),
+    tc.AllPrimitives(),
+    tc.SingleUnion(tc.EasyUnion(b=True)),
+    tc.MixedRuns(a=1, b=2, c=3.0, d="four", e=5, f=6, g=[7.0, 8.0], h=[9, 10, 11]),
+    tc.SingleBytes(b"\x00\x01\x02"),
+    tc.NestedSequence(
+        nested=tc.SingleNested(tc.SingleInt(7)),
+        values=[tc.MixedRuns(a=i, b=2, c=3.0, d="x" * i, e=5, f=6, g=[7.0] * i, h=[9, 10, 11]) for i in range(3)]
+    )
+]
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+@pytest.mark.parametrize("value", lazy_test_data)
+def test_lazy_members(value, endianness):
+    lazy = type(value).deserialize(value.serialize(endianness=endianness), lazy=True)
+
+    assert isinstance(lazy, LazySample)
+    for member in type(value).cdr.machine.members_machines:
+        assert getattr(lazy, member) == getattr(value, member)
+    assert lazy.materialize() == value
+    assert type(lazy.materialize()) is type(value)
+
+
+@pytest.mark.parametrize("value", lazy_test_data)
+def test_lazy_offsets_match_scan(value):
+    for endianness in (Endianness.Little, Endianness.Big):
+        data = value.serialize(endianness=endianness)
+        compiled, scanned = Buffer(data).seek(4), Buffer(data).seek(4)
+        compiled.set_endianness(endianness)
+        scanned.set_endianness(endianness)
+        layout = type(value).cdr.lazy_layout(compiled)
+
+        assert layout.offsets(compiled) == layout.scan(scanned)
+        assert compiled.tell() == scanned.tell() == len(data)
+
+
+def test_lazy_decodes_on_access():
+    value = tc.MixedRuns(a=1, b=2, c=3.0, d="four", e=5, f=6, g=[7.0, 8.0], h=[9, 10, 11])
+    lazy = tc.MixedRuns.deserialize(value.serialize(), lazy=True)
+
+    assert "d" not in vars(lazy)
+    assert lazy.d == "four"
+    assert "d" in vars(lazy) and "g" not in vars(lazy)
+
+    lazy.g = [1.0]
+    lazy.sample_info = "info"
+    materialized = lazy.materialize()
+    assert materialized.g == [1.0]
+    assert materialized.sample_info == "info"
+    assert lazy == tc.MixedRuns(a=1, b=2, c=3.0, d="four", e=5, f=6, g=[1.0], h=[9, 10, 11])
+
+    with pytest.raises(AttributeError):
+        lazy.not_a_member
+
+
+def test_lazy_truncated():
+    data = tc.SingleString("Hello").serialize()
+    with pytest.raises(IndexError):
+        tc.SingleString.deserialize(data[:-2], lazy=True)
@@ -0,0 +1,77 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pycdr import cdr
+from pycdr.machinery import Endianness
+import pycdr.types as pt
+
+
+@cdr(numpy=True)
+class NumpyArrays:
+    a: pt.int8
+    b: pt.array[pt.float32, 5]
+    c: pt.sequence[pt.float64]
+    d: pt.sequence[pt.int16, 10]
+    e: pt.array[str, 2]
+
+
+@cdr
+class ListArrays:
+    a: pt.int8
+    b: pt.array[pt.float32, 5]
+    c: pt.sequence[pt.float64]
+    d: pt.sequence[pt.int16, 10]
+    e: pt.array[str, 2]
+
+
+def make_value(cls, wrap):
+    return cls(
+        a=1,
+        b=wrap([0.5, 1.5, 2.5, 3.5, 4.5], np.float32),
+        c=wrap([1.0, 2.0, 3.0], np.float64),
+        d=wrap([], np.int16),
+        e=["x", "y"]
+    )
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_numpy_roundtrip(endianness):
+    v1 = make_value(NumpyArrays, np.array)
+    v2 = NumpyArrays.deserialize(v1.serialize(endianness=endianness))
+
+    assert v2.a == v1.a and v2.e == v1.e
+    for field in "bcd":
+        array = getattr(v2, field)
+        assert isinstance(array, np.ndarray)
+        assert array.dtype.isnative
+        assert np.array_equal(array, getattr(v1, field))
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_numpy_same_encoding_as_lists(endianness):
+    numpy_data = make_value(NumpyArrays, np.array).serialize(endianness=endianness)
+    list_data = make_value(ListArrays, lambda v, t: v).serialize(endianness=endianness)
+    assert numpy_data == list_data
+
+
+def test_numpy_accepts_lists():
+    v = make_value(NumpyArrays, lambda v, t: v)
+    assert np.array_equal(NumpyArrays.deserialize(v.serialize()).b, v.b)
+
+
+def test_numpy_array_size_checked():
+    v = make_value(NumpyArrays, np.array)
+    v.b = np.zeros(4, dtype=np.float32)
+    with pytest.raises(Exception):
+        v.serialize()
+
+
+def test_numpy_views():
+    data = bytearray(make_value(NumpyArrays, np.array).serialize(endianness=Endianness.native()))
+    copied = NumpyArrays.deserialize(data)
+    viewed = NumpyArrays.deserialize(data, views=True)
+
+    assert not np.shares_memory(copied.c, viewed.c)
+    assert np.shares_memory(viewed.c, np.frombuffer(data, dtype=np.uint8))
+    assert np.array_equal(copied.c, viewed.c)
@@ -0,0 +1,49 @@
+import pytest
+import dataclasses
+import test_classes as tc
+
+from pycdr.machinery import Endianness
+
+
+value = tc.MixedRuns(a=1, b=2, c=3.0, d="four", e=5, f=6, g=[7.0, 8.0], h=[9, 10, 11])
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+@pytest.mark.parametrize("fields", [
+    ("a",), ("b",), ("c", "a"), ("d",), ("e", "f"), ("f",), ("g",), ("h",), ("a", "h"), ("b", "d", "g"),
+    ("a", "b", "c", "d", "e", "f", "g", "h")
+])
+def test_projection(fields, endianness):
+    projection = tc.MixedRuns.cdr.projection(*fields)
+    record = projection.deserialize(value.serialize(endianness=endianness))
+
+    assert type(record) is projection.type
+    assert tuple(f.name for f in dataclasses.fields(record)) == fields
+    for field in fields:
+        assert getattr(record, field) == getattr(value, field)
+
+
+def test_projection_nested():
+    nested = tc.NestedSequence(
+        nested=tc.SingleNested(tc.SingleInt(7)),
+        values=[tc.MixedRuns(a=i, b=2, c=3.0, d="x" * i, e=5, f=6, g=[7.0] * i, h=[9, 10, 11]) for i in range(3)]
+    )
+    assert tc.NestedSequence.cdr.projection("values").deserialize(nested.serialize()).values == nested.values
+
+
+def test_projection_does_not_decode_skipped():
+    data = bytearray(value.serialize())
+    data[data.index(b"four")] = 0xff  # Invalid utf-8
+
+    with pytest.raises(Exception):
+        tc.MixedRuns.deserialize(data)
+    assert tc.MixedRuns.cdr.projection("a", "g").deserialize(data).g == [7.0, 8.0]
+
+
+def test_projection_is_cached():
+    assert tc.MixedRuns.cdr.projection("a", "b") is tc.MixedRuns.cdr.projection("a", "b")
+
+
+def test_projection_unknown_member():
+    with pytest.raises(ValueError):
+        tc.MixedRuns.cdr.projection("z")